@@ -0,0 +1,229 @@
+"""Headless batch summarizer.
+
+Summarizes each YouTube video or playlist URL from a file (or stdin) without
+Streamlit:
+
+    python batch.py urls.txt --language ja --output summaries.jsonl --db
+
+Finished videos are recorded in a checkpoint file, so re-running the same
+command after a crash skips them and only processes the rest.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from dotenv import load_dotenv
+from utils import YouTubeHandler, GeminiProcessor
+from utils.db_handler import DatabaseHandler, compute_source_hash
+from utils.metrics import start_metrics_server, track_request
+from utils.transcript import link_timestamps
+
+logger = logging.getLogger('batch')
+
+class Checkpoint:
+    """Append-only record of the videos a batch run has finished.
+
+    Entries are keyed by (video_id, language, prompt_version), so runs in
+    another language or with another prompt (e.g. --hierarchical) sharing
+    the same file do not skip each other's videos. Lines written before
+    entries carried the language hold only a video ID and match nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Set[Tuple[str, ...]] = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {tuple(line.rstrip('\n').split('\t')) for line in f if line.strip()}
+
+    def is_done(self, video_id: str, language: str, prompt_version: str) -> bool:
+        return (video_id, language, prompt_version) in self.done
+
+    def mark_done(self, video_id: str, language: str, prompt_version: str):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\t'.join((video_id, language, prompt_version)) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.done.add((video_id, language, prompt_version))
+
+class BatchSummarizer:
+    """Summarize videos one by one with bounded concurrency."""
+
+    def __init__(self, youtube_handler: YouTubeHandler, gemini_processor: GeminiProcessor,
+                 language: str, checkpoint: Checkpoint,
+                 output: Optional[TextIO] = None, db_handler: Optional[DatabaseHandler] = None,
+                 hierarchical: bool = False):
+        self.youtube_handler = youtube_handler
+        self.gemini_processor = gemini_processor
+        self.language = language
+        self.checkpoint = checkpoint
+        self.output = output
+        self.db_handler = db_handler
+        self.hierarchical = hierarchical
+        self.prompt_version = GeminiProcessor.PROMPT_VERSION + ('-hierarchical' if hierarchical else '')
+        self._output_lock = threading.Lock()
+
+    def summarize(self, url: str, video_id: str) -> Dict:
+        """Summarize a single video and return its JSONL record."""
+        record = {'url': url, 'video_id': video_id, 'language': self.language}
+        source_hash = compute_source_hash([video_id], self.language, self.prompt_version)
+
+        # 保存済みの要約があればAIを呼ばずに再利用する
+        if self.db_handler:
+            cached = self.db_handler.get_summary_by_hash(source_hash)
+            if cached:
+                record.update(title=cached.title, summary=cached.summary, cached=True)
+                return record
+
+        video_data = self.youtube_handler.process_videos([url], max_workers=1)
+        if 'error' in video_data[0]:
+            record['error'] = video_data[0]['error']
+            return record
+
+        if self.hierarchical:
+            video_data = self.gemini_processor.condense_video_data(video_data, language=self.language)
+        summary = link_timestamps(
+            self.gemini_processor.generate_article(video_data, language=self.language), [video_id]
+        )
+        record.update(title=video_data[0]['title'], summary=summary, cached=False)
+
+        if self.db_handler:
+            # チェックポイントに記録する前に保存を完了させる（非同期だと中断時に要約が失われる）
+            self.db_handler.save_summary(
+                video_id=video_id,
+                title=video_data[0]['title'],
+                summary=summary,
+                language=self.language,
+                source_urls=url,
+                thumbnail_url=video_data[0].get('thumbnail'),
+                source_hash=source_hash
+            )
+        return record
+
+    def _run_one(self, url: str, video_id: str) -> bool:
+        with track_request('batch_summarize') as metrics:
+            try:
+                record = self.summarize(url, video_id)
+            except Exception as e:
+                record = {'url': url, 'video_id': video_id, 'language': self.language, 'error': str(e)}
+        record['processed_at'] = datetime.utcnow().isoformat()
+        record['metrics'] = metrics.as_dict()
+
+        if self.output:
+            with self._output_lock:
+                self.output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                self.output.flush()
+
+        if 'error' in record:
+            # 失敗した動画は再実行時にもう一度処理する
+            logger.warning("Failed %s: %s", url, record['error'])
+            return False
+        self.checkpoint.mark_done(video_id, self.language, self.prompt_version)
+        logger.info("Summarized %s", url)
+        return True
+
+    def run(self, urls: List[str], concurrency: int) -> Dict[str, int]:
+        """Process every URL not yet in the checkpoint; returns counts by outcome."""
+        stats = {'skipped': 0, 'invalid': 0, 'succeeded': 0, 'failed': 0}
+        # URLを正規化して重複を除き、プレイリストはすべての動画に展開する
+        resolved, errors = self.youtube_handler.resolve_urls(urls, max_playlist_videos=None)
+        for error in errors:
+            logger.warning("%s: %s", error['error'], error['url'])
+            stats['invalid'] += 1
+
+        pending: Dict[str, str] = {}
+        for url in resolved:
+            video_id = self.youtube_handler.extract_video_id(url)
+            if self.checkpoint.is_done(video_id, self.language, self.prompt_version):
+                stats['skipped'] += 1
+                continue
+            pending[video_id] = url
+
+        # 動画情報は50件ずつまとめて先に取得しておく
+        if pending:
+            try:
+                self.youtube_handler.get_videos_details(list(pending))
+            except Exception as e:
+                # 一時的なエラーやクォータ超過でも中断せず、動画ごとの取得に任せる
+                logger.warning("Could not prefetch video details, fetching per video: %s", e)
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            results = executor.map(lambda item: self._run_one(item[1], item[0]), pending.items())
+            for succeeded in results:
+                stats['succeeded' if succeeded else 'failed'] += 1
+        return stats
+
+def read_urls(source: TextIO) -> List[str]:
+    """Read one URL per line, ignoring blank lines and # comments."""
+    return [line.strip() for line in source if line.strip() and not line.lstrip().startswith('#')]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Summarize YouTube videos in bulk without the web UI.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="File with one YouTube URL per line ('-' for stdin, the default)")
+    parser.add_argument('--language', choices=['ja', 'en', 'zh'], default='ja',
+                        help="Summary language (default: ja)")
+    parser.add_argument('--output', help="Append one JSON record per video to this JSONL file")
+    parser.add_argument('--db', action='store_true', help="Save summaries to the Supabase database")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Number of videos processed at once (default: 4)")
+    parser.add_argument('--checkpoint',
+                        help="Checkpoint file of finished videos, per language and prompt version "
+                             "(default: <output>.checkpoint, or .cache/batch.checkpoint)")
+    parser.add_argument('--hierarchical', action='store_true',
+                        help="Use map-reduce summarization for long videos")
+    parser.add_argument('--verbose', '-v', action='store_true', help="Log every video")
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.db:
+        parser.error("nothing to write results to: pass --output and/or --db")
+    if not args.checkpoint:
+        args.checkpoint = f"{args.output}.checkpoint" if args.output else os.path.join('.cache', 'batch.checkpoint')
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    load_dotenv()
+    start_metrics_server()
+
+    if args.input == '-':
+        urls = read_urls(sys.stdin)
+    else:
+        with open(args.input, encoding='utf-8') as f:
+            urls = read_urls(f)
+
+    checkpoint_dir = os.path.dirname(args.checkpoint)
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    db_handler = DatabaseHandler() if args.db else None
+    output = open(args.output, 'a', encoding='utf-8') if args.output else None
+    try:
+        summarizer = BatchSummarizer(
+            youtube_handler=YouTubeHandler(api_key=os.environ['YOUTUBE_API_KEY']),
+            gemini_processor=GeminiProcessor(api_key=os.environ['GEMINI_API_KEY']),
+            language=args.language,
+            checkpoint=Checkpoint(args.checkpoint),
+            output=output,
+            db_handler=db_handler,
+            hierarchical=args.hierarchical
+        )
+        stats = summarizer.run(urls, args.concurrency)
+    finally:
+        if output:
+            output.close()
+
+    print(json.dumps(stats), file=sys.stderr)
+    return 1 if stats['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
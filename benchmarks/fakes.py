@@ -0,0 +1,358 @@
+"""Local stand-ins for the external services used by the app.
+
+Each fake mimics just enough of the real client's interface for the code in
+utils/ to run unchanged, with configurable latency so benchmarks measure
+our own overhead plus a predictable, network-free service time.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+import hashlib
+import sqlite3
+import threading
+import time
+import httplib2
+from googleapiclient.errors import HttpError
+
+def _channel_for(video_id: str) -> str:
+    # 動画を10個のチャンネルに決定的に振り分ける
+    bucket = int(hashlib.md5(video_id.encode()).hexdigest(), 16) % 10
+    return 'UC' + hashlib.md5(str(bucket).encode()).hexdigest()[:22]
+
+class _Request:
+    def __init__(self, handler, params: Dict, latency: float):
+        self._handler = handler
+        self._params = params
+        self._latency = latency
+        self.headers: Dict[str, str] = {}
+
+    def execute(self) -> Dict:
+        time.sleep(self._latency)
+        return self._handler(self._params, self.headers)
+
+class _Resource:
+    def __init__(self, handler, latency: float):
+        self._handler = handler
+        self._latency = latency
+
+    def list(self, **params) -> _Request:
+        return _Request(self._handler, params, self._latency)
+
+class FakeYouTubeService:
+    """Stand-in for build('youtube', 'v3'): videos, channels, playlistItems and search."""
+
+    def __init__(self, latency: float = 0.05, uploads_per_channel: int = 20):
+        self.latency = latency
+        self.uploads_per_channel = uploads_per_channel
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def _video_item(self, video_id: str) -> Dict:
+        return {
+            'id': video_id,
+            'snippet': {
+                'title': f"Benchmark video {video_id}",
+                'description': f"Description of {video_id}",
+                'channelId': _channel_for(video_id),
+                'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}}
+            }
+        }
+
+    def _videos_list(self, params: Dict, headers: Dict) -> Dict:
+        self._count('videos.list')
+        ids = [vid for vid in params['id'].split(',') if not vid.startswith('missing')]
+        return {'items': [self._video_item(vid) for vid in ids]}
+
+    def _channels_list(self, params: Dict, headers: Dict) -> Dict:
+        self._count('channels.list')
+        channel_id = params['id']
+        return {'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}}}]}
+
+    def _uploads(self, channel_suffix: str, count: int) -> List[str]:
+        return [f"{channel_suffix[:6]}{i:05d}" for i in range(count)]
+
+    def _playlist_items_list(self, params: Dict, headers: Dict) -> Dict:
+        self._count('playlistItems.list')
+        etag = f"etag-{params['playlistId']}"
+        if headers.get('If-None-Match') == etag:
+            raise HttpError(httplib2.Response({'status': 304}), b'')
+        items = [
+            {'contentDetails': {'videoId': vid},
+             'snippet': {
+                'title': f"Upload {vid}",
+                'resourceId': {'videoId': vid},
+                'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"}}
+            }}
+            for vid in self._uploads(params['playlistId'][2:], min(params['maxResults'], self.uploads_per_channel))
+        ]
+        return {'etag': etag, 'items': items}
+
+    def _search_list(self, params: Dict, headers: Dict) -> Dict:
+        self._count('search.list')
+        items = [
+            {'id': {'kind': 'youtube#video', 'videoId': vid},
+             'snippet': {'title': f"Upload {vid}",
+                         'thumbnails': {'high': {'url': f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"}}}}
+            for vid in self._uploads(params['channelId'][2:], params['maxResults'])
+        ]
+        return {'items': items}
+
+    def videos(self) -> _Resource:
+        return _Resource(self._videos_list, self.latency)
+
+    def channels(self) -> _Resource:
+        return _Resource(self._channels_list, self.latency)
+
+    def playlistItems(self) -> _Resource:
+        return _Resource(self._playlist_items_list, self.latency)
+
+    def search(self) -> _Resource:
+        return _Resource(self._search_list, self.latency)
+
+class FakeTranscriptProvider:
+    """Stand-in for YouTubeTranscriptApi.get_transcript."""
+
+    SENTENCE = "This is a sentence from the benchmark transcript about machine learning."
+
+    def __init__(self, latency: float = 0.1, segments: int = 600):
+        self.latency = latency
+        self.segments = segments
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_transcript(self, video_id: str, languages: Optional[List[str]] = None) -> List[Dict]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return [
+            {'text': self.SENTENCE, 'start': i * 4.0, 'duration': 4.0}
+            for i in range(self.segments)
+        ]
+
+class _FakeCandidateChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class _FakeTokenCount:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel with a configurable time to first token and token rate."""
+
+    OUTPUT_TEXT = {
+        'ja': "この動画では機械学習の基礎について説明しています。重要なポイントは次のとおりです。",
+        'zh': "本视频介绍了机器学习的基础知识。主要内容如下。",
+        'en': "This video explains the basics of machine learning. The key points are as follows. "
+    }
+
+    def __init__(self, first_token_latency: float = 0.3, tokens_per_second: float = 200,
+                 output_tokens: int = 400, count_tokens_latency: float = 0.05):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.count_tokens_latency = count_tokens_latency
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def _language(self, prompt: str) -> str:
+        if '简体中文' in prompt:
+            return 'zh'
+        if 'Output Language: en' in prompt or 'in English' in prompt:
+            return 'en'
+        return 'ja'
+
+    def _chunks(self, prompt: str, tokens_per_chunk: int = 20) -> List[str]:
+        sample = self.OUTPUT_TEXT[self._language(prompt)]
+        # 1トークンあたりおよそ4文字（CJKは1文字）として出力を組み立てる
+        chars_per_token = 4 if self._language(prompt) == 'en' else 1
+        text = (sample * (self.output_tokens * chars_per_token // len(sample) + 1))[:self.output_tokens * chars_per_token]
+        size = tokens_per_chunk * chars_per_token
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _stream(self, chunks: List[str], tokens_per_chunk: int = 20) -> Iterator[_FakeCandidateChunk]:
+        time.sleep(self.first_token_latency)
+        for chunk in chunks:
+            yield _FakeCandidateChunk(chunk)
+            time.sleep(tokens_per_chunk / self.tokens_per_second)
+
+    def generate_content(self, prompt: str, generation_config=None, stream: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+        chunks = self._chunks(prompt)
+        if stream:
+            return self._stream(chunks)
+        time.sleep(self.first_token_latency + self.output_tokens / self.tokens_per_second)
+        return _FakeCandidateChunk(''.join(chunks))
+
+    def count_tokens(self, text: str) -> _FakeTokenCount:
+        time.sleep(self.count_tokens_latency)
+        return _FakeTokenCount(len(text) // 4)
+
+class _Response:
+    def __init__(self, data: List[Dict]):
+        self.data = data
+
+_OPERATORS = {'eq': '=', 'neq': '!=', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>='}
+
+def _split_top_level(expr: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in expr:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and depth == 0 and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+def _parse_logic(expr: str, joiner: str) -> Tuple[str, List]:
+    """Translate a PostgREST logic tree (as passed to or_()) into SQL."""
+    clauses, params = [], []
+    for part in _split_top_level(expr):
+        for name, inner_joiner in (('and(', 'AND'), ('or(', 'OR')):
+            if part.startswith(name) and part.endswith(')'):
+                sql, inner_params = _parse_logic(part[len(name):-1], inner_joiner)
+                break
+        else:
+            column, op, value = part.split('.', 2)
+            sql, inner_params = f"{column} {_OPERATORS[op]} ?", [value.strip('"')]
+        clauses.append(f"({sql})")
+        params.extend(inner_params)
+    return f" {joiner} ".join(clauses), params
+
+class _FakeQuery:
+    def __init__(self, client: 'FakeSupabaseClient', table: str):
+        self._client = client
+        self._table = table
+        self._action = 'select'
+        self._columns = '*'
+        self._rows: List[Dict] = []
+        self._where: List[Tuple[str, List]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+
+    def select(self, columns: str = '*'):
+        self._action, self._columns = 'select', columns
+        return self
+
+    def insert(self, rows):
+        self._action = 'insert'
+        self._rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self):
+        self._action = 'delete'
+        return self
+
+    def eq(self, column: str, value):
+        self._where.append((f"{column} = ?", [value]))
+        return self
+
+    def gt(self, column: str, value):
+        self._where.append((f"{column} > ?", [value]))
+        return self
+
+    def in_(self, column: str, values):
+        values = list(values)
+        self._where.append((f"{column} IN ({','.join('?' * len(values))})", values))
+        return self
+
+    def or_(self, expr: str):
+        self._where.append(_parse_logic(expr, 'OR'))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order.append(f"{column} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _where_sql(self) -> Tuple[str, List]:
+        if not self._where:
+            return '', []
+        params = [param for _, clause_params in self._where for param in clause_params]
+        return ' WHERE ' + ' AND '.join(f"({sql})" for sql, _ in self._where), params
+
+    def execute(self) -> _Response:
+        time.sleep(self._client.latency)
+        with self._client.lock:
+            conn = self._client.conn
+            where, params = self._where_sql()
+            if self._action == 'insert':
+                inserted = []
+                for row in self._rows:
+                    columns = ', '.join(row)
+                    cursor = conn.execute(
+                        f"INSERT INTO {self._table} ({columns}) VALUES ({','.join('?' * len(row))})",
+                        list(row.values())
+                    )
+                    inserted.append({'id': cursor.lastrowid, **row})
+                return _Response(inserted)
+            if self._action == 'delete':
+                rows = conn.execute(f"SELECT * FROM {self._table}{where}", params).fetchall()
+                conn.execute(f"DELETE FROM {self._table}{where}", params)
+                return _Response([dict(row) for row in rows])
+
+            sql = f"SELECT {self._columns} FROM {self._table}{where}"
+            if self._order:
+                sql += ' ORDER BY ' + ', '.join(self._order)
+            if self._limit is not None:
+                sql += f" LIMIT {int(self._limit)}"
+            return _Response([dict(row) for row in conn.execute(sql, params).fetchall()])
+
+class _MissingRpc:
+    def __init__(self, name: str):
+        self._name = name
+
+    def execute(self):
+        # postgrest の APIError と同じく、未定義の関数は PGRST202 で失敗する
+        error = Exception(f"Could not find the function public.{self._name} in the schema cache")
+        error.code = 'PGRST202'
+        raise error
+
+class FakeSupabaseClient:
+    """In-memory SQLite stand-in for the PostgREST subset DatabaseHandler uses.
+
+    RPC functions are not provided, so search goes through the local
+    inverted-index fallback as on a backend without db/migration.sql.
+    """
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(
+            '''CREATE TABLE video_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                language TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                source_urls TEXT NOT NULL,
+                thumbnail_url TEXT,
+                source_hash TEXT
+            )'''
+        )
+        self.conn.execute('CREATE INDEX idx_language_timestamp_id ON video_summaries(language, timestamp DESC, id DESC)')
+        self.conn.execute('CREATE INDEX idx_source_hash ON video_summaries(source_hash)')
+
+    def from_(self, table: str) -> _FakeQuery:
+        return _FakeQuery(self, table)
+
+    def rpc(self, name: str, params: Dict) -> _MissingRpc:
+        return _MissingRpc(name)
@@ -0,0 +1,142 @@
+"""Cold-start import benchmark.
+
+Imports each app module (and the module-level imports of main.py and
+pages/history.py) in a fresh interpreter, records how long it takes and which
+heavy dependencies it pulls in, and saves the result as JSON:
+
+    python -m benchmarks.import_time --label before
+    python -m benchmarks.import_time --label after --compare benchmarks/results/import-time-before.json
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+MODULES = [
+    'utils',
+    'utils.metrics',
+    'utils.db_handler',
+    'utils.thumbnail_cache',
+    'utils.image_handler',
+    'utils.job_queue',
+    'utils.youtube_handler',
+    'utils.gemini_processor',
+    'utils.pipeline'
+]
+ENTRYPOINTS = ['main.py', 'pages/history.py']
+HEAVY_DEPENDENCIES = [
+    'streamlit',
+    'googleapiclient',
+    'google.generativeai',
+    'youtube_transcript_api',
+    'supabase',
+    'PIL'
+]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+error = None
+try:
+    exec(compile({source!r}, {name!r}, 'exec'), {{'__name__': '__import_probe__'}})
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'error': error,
+    'loaded': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def entrypoint_imports(path: Path) -> str:
+    """Return only the top-level import statements of a script (the rest needs a Streamlit session)."""
+    tree = ast.parse(path.read_text(encoding='utf-8'))
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return ast.unparse(ast.Module(body=imports, type_ignores=[]))
+
+def probe(name: str, source: str) -> Dict:
+    """Run ``source`` in a fresh interpreter and return its import time and loaded dependencies."""
+    code = _PROBE.format(source=source, name=name, heavy=HEAVY_DEPENDENCIES)
+    completed = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'seconds': None, 'error': completed.stderr.strip().splitlines()[-1], 'loaded': []}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def measure(name: str, source: str, repeat: int) -> Dict:
+    runs = [probe(name, source) for _ in range(repeat)]
+    samples = [run['seconds'] for run in runs if run['seconds'] is not None and not run['error']]
+    return {
+        'runs': repeat,
+        'median': statistics.median(samples) if samples else None,
+        'min': min(samples) if samples else None,
+        'loaded': runs[-1]['loaded'],
+        'error': runs[-1]['error']
+    }
+
+def compare(current: Dict, baseline: Dict):
+    print(f"\nCompared with {baseline['label']} ({baseline.get('git_commit') or 'unknown commit'}):")
+    for name, stats in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before or before['median'] is None or stats['median'] is None:
+            print(f"{name:<28} {'n/a':>10}")
+            continue
+        change = (stats['median'] - before['median']) / before['median'] * 100
+        print(f"{name:<28} {before['median'] * 1000:8.1f} ms -> {stats['median'] * 1000:8.1f} ms  "
+              f"({change:+.1f}%)")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the app modules.")
+    parser.add_argument('--label', default=datetime.now().strftime('%Y%m%d-%H%M%S'),
+                        help="Result file is benchmarks/results/import-time-<label>.json")
+    parser.add_argument('--compare', help="Previous result JSON to compare against")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per target (default: 5)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    targets = {module: f"import {module}" for module in MODULES}
+    targets.update({path: entrypoint_imports(ROOT / path) for path in ENTRYPOINTS})
+
+    results = {}
+    for name, source in targets.items():
+        stats = measure(name, source, args.repeat)
+        results[name] = stats
+        timing = f"{stats['median'] * 1000:8.1f} ms" if stats['median'] is not None else f"{'failed':>11}"
+        print(f"{name:<28} {timing}   loads: {', '.join(stats['loaded']) or '-'}"
+              + (f"   ({stats['error']})" if stats['error'] else ''), flush=True)
+
+    try:
+        git_commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_commit = None
+
+    result = {
+        'label': args.label,
+        'created_at': datetime.now().isoformat(),
+        'git_commit': git_commit,
+        'python': sys.version.split()[0],
+        'results': results
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"import-time-{args.label}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(result, json.load(f))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
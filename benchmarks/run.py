@@ -0,0 +1,335 @@
+"""Offline benchmarks for the summarize pipeline.
+
+Runs the YouTube, Gemini and database code paths against the local fakes in
+benchmarks/fakes.py (no network or API keys needed) at several batch sizes,
+and saves the timings as JSON so versions can be compared:
+
+    python -m benchmarks.run --label before
+    python -m benchmarks.run --label after --compare benchmarks/results/before.json
+"""
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from .fakes import FakeGeminiModel, FakeSupabaseClient, FakeTranscriptProvider, FakeYouTubeService
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+def measure(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """Time ``func`` ``repeat`` times; ``setup`` runs untimed before each run."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'runs': repeat,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'max': max(samples)
+    }
+
+class _NullJob:
+    """JobContext stand-in that discards progress reports."""
+
+    def update(self, stage: str, progress: float):
+        pass
+
+    def set_partial_text(self, text: str, force: bool = False):
+        pass
+
+class BenchmarkSuite:
+    """Benchmarks of process_videos, build_prompt, generate_article and DatabaseHandler."""
+
+    def __init__(self, args: argparse.Namespace, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.language = args.language
+        self.youtube_service = FakeYouTubeService(latency=args.youtube_latency)
+        self.transcripts = FakeTranscriptProvider(latency=args.transcript_latency,
+                                                  segments=args.transcript_segments)
+        self.gemini_model = FakeGeminiModel(first_token_latency=args.gemini_first_token,
+                                            tokens_per_second=args.gemini_token_rate,
+                                            output_tokens=args.gemini_output_tokens)
+        self.results: Dict[str, Dict] = {}
+
+    def _record(self, name: str, stats: Dict):
+        self.results[name] = stats
+        print(f"{name:<48} median {stats['median'] * 1000:10.1f} ms   "
+              f"min {stats['min'] * 1000:10.1f} ms", flush=True)
+
+    def _fresh_transcript_cache(self):
+        from utils.youtube_handler import TranscriptCache
+        return TranscriptCache(path=os.path.join(self.workdir, f"transcripts-{uuid.uuid4().hex}.sqlite3"))
+
+    def _youtube_handler(self):
+        from utils.youtube_handler import YouTubeHandler
+        return YouTubeHandler(api_key='benchmark', transcript_cache=self._fresh_transcript_cache())
+
+    def _gemini_processor(self):
+        from utils.gemini_processor import GeminiProcessor
+        return GeminiProcessor(api_key='benchmark')
+
+    def _database_handler(self):
+        from utils import db_handler
+        with mock.patch.object(db_handler, 'get_shared_client',
+                               return_value=FakeSupabaseClient(latency=self.args.db_latency)):
+            return db_handler.DatabaseHandler()
+
+    @staticmethod
+    def _urls(size: int) -> List[str]:
+        return [f"https://www.youtube.com/watch?v=b{size:03d}{i:07d}" for i in range(size)]
+
+    def bench_youtube(self, size: int):
+        urls = self._urls(size)
+        video_ids = [url.rsplit('=', 1)[1] for url in urls]
+        state = {}
+
+        def fresh_handler():
+            state['handler'] = self._youtube_handler()
+
+        self._record(f"youtube.get_videos_details[n={size}]",
+                     measure(lambda: state['handler'].get_videos_details(video_ids),
+                             self.args.repeat, fresh_handler))
+        self._record(f"youtube.process_videos.cold[n={size}]",
+                     measure(lambda: state['handler'].process_videos(urls), self.args.repeat, fresh_handler))
+        # 同じハンドラーで再実行し、動画詳細と文字起こしのキャッシュが効いた状態を測る
+        self._record(f"youtube.process_videos.warm[n={size}]",
+                     measure(lambda: state['handler'].process_videos(urls), self.args.repeat))
+        return state['handler'].process_videos(urls)
+
+    def bench_gemini(self, size: int, video_data: List[Dict]):
+        processor = self._gemini_processor()
+        self._record(f"gemini.build_prompt[n={size}]",
+                     measure(lambda: processor.build_prompt(video_data, self.language), self.args.repeat))
+        self._record(f"gemini.generate_article[n={size}]",
+                     measure(lambda: processor.generate_article(video_data, language=self.language),
+                             self.args.repeat))
+
+        def first_chunk():
+            stream = processor.generate_article_stream(video_data, language=self.language)
+            next(stream)
+            stream.close()
+
+        self._record(f"gemini.generate_article_stream.first_chunk[n={size}]",
+                     measure(first_chunk, self.args.repeat))
+
+    def bench_database(self, size: int):
+        db = self._database_handler()
+        rows = [
+            db._build_summary_row(
+                video_id=f"b{size:03d}{i:07d}",
+                title=f"Benchmark video {i} machine learning",
+                summary=f"Summary {i}: this video explains machine learning and neural networks.",
+                language=self.language,
+                source_urls=f"https://www.youtube.com/watch?v=b{size:03d}{i:07d}",
+                thumbnail_url=f"https://i.ytimg.com/vi/b{size:03d}{i:07d}/hqdefault.jpg",
+                source_hash=f"hash-{size}-{i}"
+            )
+            for i in range(size)
+        ]
+
+        def save_each():
+            for row in rows:
+                db.save_summary(**{key: value for key, value in row.items() if key != 'timestamp'})
+
+        self._record(f"db.save_summary[n={size}]", measure(save_each, self.args.repeat))
+        self._record(f"db.insert_summaries[n={size}]",
+                     measure(lambda: db.insert_summaries(rows), self.args.repeat))
+
+        def save_async():
+            for row in rows:
+                db.save_summary_async(**{key: value for key, value in row.items() if key != 'timestamp'})
+            db.flush_pending_writes()
+
+        self._record(f"db.save_summary_async+flush[n={size}]", measure(save_async, self.args.repeat))
+
+        self._record(f"db.get_summary_by_hash[n={size}]",
+                     measure(lambda: db.get_summary_by_hash(f"hash-{size}-{size - 1}"), self.args.repeat))
+        self._record(f"db.get_summaries_page.first[n={size}]",
+                     measure(lambda: db.get_summaries_page(self.language), self.args.repeat))
+
+        def walk_pages():
+            cursor = None
+            while True:
+                _, cursor = db.get_summaries_page(self.language, cursor=cursor)
+                if cursor is None:
+                    break
+
+        self._record(f"db.get_summaries_page.walk[n={size}]", measure(walk_pages, self.args.repeat))
+
+        page, _ = db.get_summaries_page(self.language)
+        self._record(f"db.get_summary_body[n={size}]",
+                     measure(lambda: [db.get_summary_body(summary.id) for summary in page], self.args.repeat))
+
+        self._record(f"db.search_summaries.cold[n={size}]",
+                     measure(lambda: db.search_summaries('machine learning', self.language),
+                             self.args.repeat, db._local_indexes.clear))
+        self._record(f"db.search_summaries.warm[n={size}]",
+                     measure(lambda: db.search_summaries('machine learning', self.language), self.args.repeat))
+
+        state = {}
+
+        def insert_for_delete():
+            db.insert_summaries(rows)
+            page, _ = db.get_summaries_page(self.language, limit=size)
+            state['ids'] = [summary.id for summary in page]
+
+        self._record(f"db.delete_summaries[n={size}]",
+                     measure(lambda: db.delete_summaries(state['ids']), self.args.repeat, insert_for_delete))
+
+    def bench_end_to_end(self, size: int):
+        from utils import youtube_handler
+        from utils.pipeline import run_summary_job
+        urls = self._urls(size)
+
+        def cold():
+            youtube_handler._shared_transcript_cache = self._fresh_transcript_cache()
+
+        self._record(f"pipeline.run_summary_job.cold[n={size}]",
+                     measure(lambda: run_summary_job(_NullJob(), urls, self.language, force_regenerate=True),
+                             self.args.repeat, cold))
+
+        from utils.db_handler import get_database_handler
+        self._record(f"pipeline.run_summary_job.cached[n={size}]",
+                     measure(lambda: run_summary_job(_NullJob(), urls, self.language), self.args.repeat,
+                             get_database_handler().flush_pending_writes))
+
+    def run(self, sizes: List[int], stages: List[str]):
+        from utils import db_handler
+        from youtube_transcript_api import YouTubeTranscriptApi
+        e2e_client = FakeSupabaseClient(latency=self.args.db_latency)
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch('googleapiclient.discovery.build_from_document',
+                                           return_value=self.youtube_service))
+            stack.enter_context(mock.patch('googleapiclient.discovery.build', return_value=self.youtube_service))
+            stack.enter_context(mock.patch.object(YouTubeTranscriptApi, 'get_transcript',
+                                                  self.transcripts.get_transcript))
+            stack.enter_context(mock.patch('google.generativeai.configure'))
+            stack.enter_context(mock.patch('google.generativeai.GenerativeModel',
+                                           return_value=self.gemini_model))
+            stack.enter_context(mock.patch.object(db_handler, 'get_shared_client', return_value=e2e_client))
+
+            for size in sizes:
+                video_data = self.bench_youtube(size) if 'youtube' in stages or 'gemini' in stages else None
+                if 'gemini' in stages:
+                    self.bench_gemini(size, video_data)
+                if 'db' in stages:
+                    self.bench_database(size)
+                if 'e2e' in stages:
+                    self.bench_end_to_end(size)
+
+def _configure_environment(workdir: str):
+    """Point caches at a scratch directory and lift rate limits so only service latency is measured."""
+    os.environ.update({
+        'YOUTUBE_API_KEY': 'benchmark',
+        'GEMINI_API_KEY': 'benchmark',
+        'SUPABASE_URL': 'http://localhost',
+        'SUPABASE_KEY': 'benchmark',
+        'YOUTUBE_DAILY_QUOTA': '1e12',
+        'YOUTUBE_QPS': '1e9',
+        'GEMINI_RPM': '1e9',
+        'GEMINI_TPM': '1e15',
+        'TRANSCRIPT_CACHE_PATH': os.path.join(workdir, 'transcripts.sqlite3'),
+        'SUMMARY_SPILL_PATH': os.path.join(workdir, 'pending_summaries.jsonl'),
+        'SUMMARY_DEAD_LETTER_PATH': os.path.join(workdir, 'failed_summaries.jsonl'),
+        'JOB_STORE_PATH': os.path.join(workdir, 'jobs.sqlite3')
+    })
+    os.environ.pop('RATE_LIMIT_DB', None)
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: Dict, baseline: Dict):
+    """Print the median of each benchmark against a previous result file."""
+    print(f"\nCompared with {baseline['label']} ({baseline.get('git_commit') or 'unknown commit'}):")
+    for name, stats in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            print(f"{name:<48} {'new':>10}")
+            continue
+        change = (stats['median'] - before['median']) / before['median'] * 100 if before['median'] else 0.0
+        print(f"{name:<48} {before['median'] * 1000:10.1f} ms -> {stats['median'] * 1000:10.1f} ms  "
+              f"({change:+.1f}%)")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument('--label', default=datetime.now().strftime('%Y%m%d-%H%M%S'),
+                        help="Name of the result file in benchmarks/results (default: current time)")
+    parser.add_argument('--compare', help="Previous result JSON to compare against")
+    parser.add_argument('--sizes', default='1,10,100', help="Comma-separated video counts (default: 1,10,100)")
+    parser.add_argument('--stages', default='youtube,gemini,db,e2e',
+                        help="Comma-separated stages to run (default: youtube,gemini,db,e2e)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark (default: 3)")
+    parser.add_argument('--language', choices=['ja', 'en', 'zh'], default='ja')
+    parser.add_argument('--youtube-latency', type=float, default=0.05,
+                        help="Seconds per YouTube Data API call (default: 0.05)")
+    parser.add_argument('--transcript-latency', type=float, default=0.1,
+                        help="Seconds per transcript fetch (default: 0.1)")
+    parser.add_argument('--transcript-segments', type=int, default=600,
+                        help="Caption segments per transcript (default: 600)")
+    parser.add_argument('--gemini-first-token', type=float, default=0.3,
+                        help="Seconds until Gemini returns its first chunk (default: 0.3)")
+    parser.add_argument('--gemini-token-rate', type=float, default=200,
+                        help="Gemini output tokens per second (default: 200)")
+    parser.add_argument('--gemini-output-tokens', type=int, default=400,
+                        help="Tokens in each generated response (default: 400)")
+    parser.add_argument('--db-latency', type=float, default=0.02,
+                        help="Seconds per database round trip (default: 0.02)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stages = args.stages.split(',')
+
+    with tempfile.TemporaryDirectory(prefix='yt-bench-') as workdir:
+        _configure_environment(workdir)
+        suite = BenchmarkSuite(args, workdir)
+        suite.run(sizes, stages)
+
+    result = {
+        'label': args.label,
+        'created_at': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('label', 'compare')},
+        'calls': {
+            'youtube': suite.youtube_service.calls,
+            'transcripts': suite.transcripts.calls,
+            'gemini': suite.gemini_model.calls
+        },
+        'results': suite.results
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{args.label}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(result, json.load(f))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,15 @@
 -- Drop existing table if it exists
 DROP TABLE IF EXISTS public.video_summaries;
 
+-- Character bigrams used to index Japanese/Chinese text (no word boundaries)
+CREATE OR REPLACE FUNCTION public.cjk_bigrams(input TEXT)
+RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT COALESCE(array_agg(DISTINCT substr(t, i, 2)), '{}')
+    FROM (SELECT regexp_replace(lower(input), '[[:space:][:punct:]、。，．！？「」『』（）]+', '', 'g') AS t) s,
+         generate_series(1, char_length(t) - 1) AS i
+$$;
+
 -- Create video_summaries table
 CREATE TABLE public.video_summaries (
     id BIGSERIAL PRIMARY KEY,
@@ -10,6 +19,17 @@ CREATE TABLE public.video_summaries (
     language VARCHAR(2) NOT NULL,
     timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     source_urls TEXT NOT NULL,
+    thumbnail_url TEXT,
+    -- sha256 of sorted video IDs + language + prompt version (summary cache key)
+    source_hash VARCHAR(64),
+
+    -- Full-text search: English tsvector and ja/zh character bigrams
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('english', title || ' ' || summary)
+    ) STORED,
+    search_bigrams TEXT[] GENERATED ALWAYS AS (
+        public.cjk_bigrams(title || ' ' || summary)
+    ) STORED,
     
     -- Add constraints for data validation
     CONSTRAINT valid_language CHECK (language IN ('en', 'ja', 'zh')),
@@ -19,6 +39,45 @@ CREATE TABLE public.video_summaries (
 -- Add indexes for common query patterns
 CREATE INDEX idx_video_summaries_language ON public.video_summaries(language);
 CREATE INDEX idx_video_summaries_timestamp ON public.video_summaries(timestamp DESC);
+-- Keyset pagination of the history list: WHERE language = ? ORDER BY timestamp DESC, id DESC
+CREATE INDEX idx_video_summaries_language_timestamp_id ON public.video_summaries(language, timestamp DESC, id DESC);
+CREATE INDEX idx_video_summaries_source_hash ON public.video_summaries(source_hash);
+CREATE INDEX idx_video_summaries_search_vector ON public.video_summaries USING GIN(search_vector);
+CREATE INDEX idx_video_summaries_search_bigrams ON public.video_summaries USING GIN(search_bigrams);
+
+-- Full-text search used by DatabaseHandler.search_summaries
+CREATE OR REPLACE FUNCTION public.search_summaries(search_query TEXT, search_language TEXT, max_results INT DEFAULT 20)
+RETURNS TABLE (id BIGINT, title TEXT, video_id VARCHAR, thumbnail_url TEXT, "timestamp" TIMESTAMPTZ)
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    IF search_language = 'en' THEN
+        RETURN QUERY
+        SELECT s.id, s.title, s.video_id, s.thumbnail_url, s.timestamp
+        FROM public.video_summaries s
+        WHERE s.language = 'en'
+          AND s.search_vector @@ websearch_to_tsquery('english', search_query)
+        ORDER BY ts_rank(s.search_vector, websearch_to_tsquery('english', search_query)) DESC, s.timestamp DESC
+        LIMIT max_results;
+    ELSIF cardinality(public.cjk_bigrams(search_query)) > 0 THEN
+        RETURN QUERY
+        SELECT s.id, s.title, s.video_id, s.thumbnail_url, s.timestamp
+        FROM public.video_summaries s
+        WHERE s.language = search_language
+          AND s.search_bigrams @> public.cjk_bigrams(search_query)
+        ORDER BY s.timestamp DESC
+        LIMIT max_results;
+    ELSE
+        -- Single-character query: too short for bigrams
+        RETURN QUERY
+        SELECT s.id, s.title, s.video_id, s.thumbnail_url, s.timestamp
+        FROM public.video_summaries s
+        WHERE s.language = search_language
+          AND (s.title || ' ' || s.summary) ILIKE '%' || search_query || '%'
+        ORDER BY s.timestamp DESC
+        LIMIT max_results;
+    END IF;
+END;
+$$;
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE public.video_summaries ENABLE ROW LEVEL SECURITY;
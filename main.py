@@ -1,9 +1,12 @@
 import streamlit as st
-import os
-from utils import YouTubeHandler, GeminiProcessor
-from utils.db_handler import DatabaseHandler
+from utils.db_handler import get_database_handler
 from utils.image_handler import ImageHandler
+from utils.thumbnail_cache import get_thumbnail_cache, ThumbnailCache
+from utils.job_queue import get_job_manager
+from utils.metrics import configure_logging, start_metrics_server
+from utils.url_normalizer import normalize_urls
 from datetime import datetime
+import time
 import traceback
 from dotenv import load_dotenv
 
@@ -19,6 +22,13 @@ st.set_page_config(
 # Enable detailed error messages
 st.set_option('client.showErrorDetails', True)
 
+# ステージごとの所要時間を構造化ログとして出力し、METRICS_PORT が設定されていれば /metrics を提供する（プロセスごとに1回）
+configure_logging()
+start_metrics_server()
+
+# バックグラウンドジョブの状態を確認する間隔（秒）
+JOB_POLL_INTERVAL = 1.0
+
 # Translations dictionary
 TRANSLATIONS = {
     'ja': {
@@ -39,13 +49,25 @@ TRANSLATIONS = {
         'no_channel_videos': 'チャンネルの他の動画を取得できませんでした',
         'db_error': 'データベースエラーが発生しました：',
         'saving_summary': '要約を保存中...',
-        'summary_saved': '要約が保存されました',
+        'summary_queued': '要約を保存しています',
         'settings_section': '設定',
         'db_connecting': 'データベースに接続中...',
         'db_connected': 'データベース接続完了',
         'db_connection_failed': 'データベース接続に失敗しました',
         'loading_channel_videos': 'チャンネルの動画を読み込み中...',
-        'view_history': '履歴を表示'
+        'view_history': '履歴を表示',
+        'force_regenerate': '保存済みの要約を再生成する',
+        'force_regenerate_help': 'オンにすると、保存済みの要約があってもAIで新しく生成します',
+        'cached_summary': '保存済みの要約を表示しています',
+        'hierarchical_mode': '長時間動画モード',
+        'hierarchical_mode_help': '文字起こしを分割して並列に要約し、最後に統合します（長い動画向け）',
+        'condensing_transcripts': '文字起こしを分割して要約中...',
+        'job_queued': '処理待ち...',
+        'resolving_urls': 'URLを確認中...',
+        'show_timings': '処理時間を表示',
+        'show_timings_help': '直近の要約生成で各処理にかかった時間とカウンターを表示します',
+        'timings_section': '処理時間',
+        'timing_total': '合計'
     },
     'en': {
         'page_title': 'Summary Generator',
@@ -65,13 +87,25 @@ TRANSLATIONS = {
         'no_channel_videos': 'Could not fetch channel videos',
         'db_error': 'Database error occurred: ',
         'saving_summary': 'Saving summary...',
-        'summary_saved': 'Summary saved successfully',
+        'summary_queued': 'Summary is being saved',
         'settings_section': 'Settings',
         'db_connecting': 'Connecting to database...',
         'db_connected': 'Database connected successfully',
         'db_connection_failed': 'Database connection failed',
         'loading_channel_videos': 'Loading channel videos...',
-        'view_history': 'View History'
+        'view_history': 'View History',
+        'force_regenerate': 'Regenerate saved summary',
+        'force_regenerate_help': 'Generate a new summary with AI even if one is already saved',
+        'cached_summary': 'Showing a previously saved summary',
+        'hierarchical_mode': 'Long video mode',
+        'hierarchical_mode_help': 'Split transcripts into chunks, summarize them in parallel, then merge (for long videos)',
+        'condensing_transcripts': 'Summarizing transcript sections...',
+        'job_queued': 'Waiting to start...',
+        'resolving_urls': 'Checking URLs...',
+        'show_timings': 'Show timings',
+        'show_timings_help': 'Show the time spent in each stage and the counters of the last summary run',
+        'timings_section': 'Timings',
+        'timing_total': 'Total'
     },
     'zh': {
         'page_title': '摘要生成器',
@@ -91,13 +125,25 @@ TRANSLATIONS = {
         'no_channel_videos': '无法获取频道视频',
         'db_error': '数据库错误：',
         'saving_summary': '正在保存摘要...',
-        'summary_saved': '摘要保存成功',
+        'summary_queued': '正在保存摘要',
         'settings_section': '设置',
         'db_connecting': '正在连接数据库...',
         'db_connected': '数据库连接成功',
         'db_connection_failed': '数据库连接失败',
         'loading_channel_videos': '正在加载频道视频...',
-        'view_history': '查看历史'
+        'view_history': '查看历史',
+        'force_regenerate': '重新生成已保存的摘要',
+        'force_regenerate_help': '即使已有保存的摘要，也使用AI重新生成',
+        'cached_summary': '正在显示已保存的摘要',
+        'hierarchical_mode': '长视频模式',
+        'hierarchical_mode_help': '将文字记录分块并行总结，最后合并（适用于长视频）',
+        'condensing_transcripts': '正在分段总结文字记录...',
+        'job_queued': '等待处理...',
+        'resolving_urls': '正在检查URL...',
+        'show_timings': '显示耗时',
+        'show_timings_help': '显示最近一次摘要生成中各步骤的耗时和计数',
+        'timings_section': '耗时',
+        'timing_total': '合计'
     }
 }
 
@@ -105,21 +151,26 @@ def initialize_session_state():
     """Initialize session state variables."""
     if 'generated_article' not in st.session_state:
         st.session_state.generated_article = None
-    if 'processing' not in st.session_state:
-        st.session_state.processing = False
+    if 'job_id' not in st.session_state:
+        # ページを再読み込みしても実行中のジョブを追跡できるよう、URLのクエリから復元する
+        st.session_state.job_id = st.query_params.get('job')
     if 'language' not in st.session_state:
         st.session_state.language = 'ja'  # Default to Japanese
     if 'channel_videos' not in st.session_state:
         st.session_state.channel_videos = []
+    if 'source_urls' not in st.session_state:
+        st.session_state.source_urls = []
+    if 'last_metrics' not in st.session_state:
+        st.session_state.last_metrics = None
 
     # Initialize database connection
     if 'db_handler' not in st.session_state:
         try:
             with st.spinner(get_text('db_connecting')):
-                st.session_state.db_handler = DatabaseHandler()
+                st.session_state.db_handler = get_database_handler()
 
-                # Test database connection
-                if not st.session_state.db_handler.verify_connection():
+                # Test database connection (直近の通信が成功していれば問い合わせは省略される)
+                if not st.session_state.db_handler.ensure_connection():
                     st.error(get_text('db_connection_failed'))
                     st.session_state.db_handler = None
                 else:
@@ -129,12 +180,8 @@ def initialize_session_state():
             st.session_state.db_handler = None
 
 def validate_urls(urls: list) -> list:
-    """Validate YouTube URLs."""
-    valid_urls = []
-    for url in urls:
-        if url.strip() and ('youtube.com' in url or 'youtu.be' in url):
-            valid_urls.append(url.strip())
-    return valid_urls
+    """Return the canonical URLs of the YouTube videos and playlists in the input, without duplicates."""
+    return normalize_urls(urls).urls
 
 def get_text(key: str) -> str:
     """Get translated text based on current language."""
@@ -144,11 +191,83 @@ def display_character_image():
     """キャラクター画像を表示"""
     image_handler = ImageHandler()
     try:
-        character_image = image_handler.create_character_bubble("こんにちは！")  # 吹き出しを追加
+        # 描画済みのPNGをそのまま渡す（再描画・再エンコードしない）
+        character_image = image_handler.render_character_bubble("こんにちは！")  # 吹き出しを追加
         st.image(character_image, use_column_width=True)
     except FileNotFoundError:
         st.error("キャラクター画像が見つかりません。")
 
+def submit_summary_job(valid_urls: list, force_regenerate: bool, hierarchical: bool):
+    """Queue the summarize pipeline as a background job."""
+    # YouTube・Gemini のクライアントは読み込みが重いため、初回の送信時に読み込む
+    from utils.pipeline import run_summary_job
+    job_id = get_job_manager().submit(
+        run_summary_job,
+        urls=valid_urls,
+        language=st.session_state.language,
+        force_regenerate=force_regenerate,
+        hierarchical=hierarchical
+    )
+    st.session_state.job_id = job_id
+    st.query_params['job'] = job_id
+
+def show_job_status():
+    """Show the progress of the current job, or apply its result once it has finished."""
+    job = get_job_manager().get(st.session_state.job_id)
+    if job is None:
+        # 保持期間を過ぎて削除されたジョブ
+        st.session_state.job_id = None
+        st.query_params.pop('job', None)
+        return
+
+    if job['status'] in ('queued', 'running'):
+        st.progress(job['progress'], text=get_text(job['stage'] or 'job_queued'))
+        # 生成中のテキストを逐次表示する
+        if job['partial_text']:
+            st.markdown(f"### {get_text('generated_article')}")
+            st.markdown(job['partial_text'])
+        return
+
+    st.session_state.job_id = None
+    st.query_params.pop('job', None)
+
+    if job['status'] == 'failed':
+        st.error(f"{get_text('error_occurred')}{job['error']}")
+        return
+
+    result = job['result']
+    st.session_state.last_metrics = result.get('metrics')
+    st.session_state.source_urls = result.get('urls', [])
+    for error in result['errors']:
+        st.error(f"{get_text('error_processing')}{error['url']}: {error['error']}")
+    if result['article'] is None:
+        return
+
+    st.session_state.generated_article = result['article']
+    if result['cached']:
+        st.info(get_text('cached_summary'))
+    if result.get('save_queued'):
+        st.success(get_text('summary_queued'))
+
+    st.session_state.channel_videos = result['channel_videos']
+    if result['channel_error']:
+        st.warning(f"{get_text('no_channel_videos')}: {result['channel_error']}")
+
+def show_timings_panel():
+    """Show the stage timings and counters of the last summary run in the sidebar."""
+    metrics = st.session_state.last_metrics
+    if not metrics:
+        return
+    st.markdown(f"#### {get_text('timings_section')}")
+    st.table([
+        {'stage': stage, 'calls': total['count'], 'seconds': round(total['seconds'], 2)}
+        for stage, total in metrics['stages'].items()
+    ])
+    if metrics['duration'] is not None:
+        st.caption(f"{get_text('timing_total')}: {metrics['duration']:.2f}s")
+    for name, value in metrics['counters'].items():
+        st.caption(f"{name}: {value:g}")
+
 def main():
     try:
         # Load custom CSS
@@ -185,8 +304,27 @@ def main():
 
         col1, col2 = st.columns([2, 1])
 
+        force_regenerate = col2.checkbox(
+            get_text('force_regenerate'),
+            value=False,
+            help=get_text('force_regenerate_help')
+        )
+
+        with st.sidebar:
+            st.markdown(f"### {get_text('settings_section')}")
+            hierarchical = st.checkbox(
+                get_text('hierarchical_mode'),
+                value=False,
+                help=get_text('hierarchical_mode_help')
+            )
+            show_timings = st.checkbox(
+                get_text('show_timings'),
+                value=False,
+                help=get_text('show_timings_help')
+            )
+
         # Process button
-        if col1.button(get_text('generate_button'), disabled=st.session_state.processing):
+        if col1.button(get_text('generate_button'), disabled=bool(st.session_state.job_id)):
             if st.session_state.db_handler is None:
                 st.error(get_text('db_error'))
                 return
@@ -199,59 +337,14 @@ def main():
                 return
 
             try:
-                st.session_state.processing = True
-
-                # Initialize handlers with environment variables
-                youtube_handler = YouTubeHandler(api_key=os.environ['YOUTUBE_API_KEY'])
-                gemini_processor = GeminiProcessor(api_key=os.environ['GEMINI_API_KEY'])
-
-                # Process videos
-                with st.spinner(get_text('processing_videos')):
-                    video_data = youtube_handler.process_videos(valid_urls)
-
-                # Check for errors
-                errors = [data for data in video_data if 'error' in data]
-                if errors:
-                    for error in errors:
-                        st.error(f"{get_text('error_processing')}{error['url']}: {error['error']}")
-                    if len(errors) == len(video_data):
-                        return
-
-                # Generate article
-                with st.spinner(get_text('generating_article')):
-                    article = gemini_processor.generate_article(
-                        video_data, 
-                        language=st.session_state.language
-                    )
-                    st.session_state.generated_article = article
-
-                    # Save to database
-                    with st.spinner(get_text('saving_summary')):
-                        if len(video_data) > 0 and 'error' not in video_data[0]:
-                            st.session_state.db_handler.save_summary(
-                                video_id=youtube_handler.extract_video_id(valid_urls[0]),
-                                title=video_data[0]['title'],
-                                summary=article,
-                                language=st.session_state.language,
-                                source_urls=','.join(valid_urls),
-                                thumbnail_url=video_data[0].get('thumbnail')  # サムネイル情報を保存
-                            )
-                            st.success(get_text('summary_saved'))
-
-                    # Get channel videos
-                    with st.spinner(get_text('loading_channel_videos')):
-                        try:
-                            channel_videos = youtube_handler.get_channel_latest_videos(valid_urls[0])
-                            st.session_state.channel_videos = channel_videos
-                        except Exception as e:
-                            st.warning(f"{get_text('no_channel_videos')}: {str(e)}")
-                            st.session_state.channel_videos = []
-
+                submit_summary_job(valid_urls, force_regenerate, hierarchical)
             except Exception as e:
                 st.error(f"{get_text('error_occurred')}{str(e)}")
                 traceback.print_exc()
-            finally:
-                st.session_state.processing = False
+
+        # 実行中のジョブの進捗を表示する
+        if st.session_state.job_id:
+            show_job_status()
 
         # Display generated article
         if st.session_state.generated_article:
@@ -260,17 +353,23 @@ def main():
 
             # Source attribution
             st.markdown(f"### {get_text('sources')}")
-            for url in validate_urls(urls_input.split('\n')):
+            for url in st.session_state.source_urls:
                 st.markdown(f'<a href="{url}" class="source-link" target="_blank">{url}</a>', 
                            unsafe_allow_html=True)
 
             # Display channel videos
             if st.session_state.channel_videos:
                 st.markdown(f"### {get_text('channel_videos')}")
+                # 縮小済みのサムネイルをまとめて並行に取得し、ローカルキャッシュから埋め込む
+                thumbnails = get_thumbnail_cache().data_uris(
+                    [video["thumbnail"] for video in st.session_state.channel_videos],
+                    ThumbnailCache.LIST_WIDTH
+                )
                 for video in st.session_state.channel_videos:
+                    thumbnail = thumbnails.get(video["thumbnail"], video["thumbnail"])
                     st.markdown(
                         f'<a href="https://youtube.com/watch?v={video["id"]}" class="video-recommendation" target="_blank">'
-                        f'<img src="{video["thumbnail"]}" style="width:120px;margin-right:10px;">'
+                        f'<img src="{thumbnail}" style="width:120px;margin-right:10px;">'
                         f'{video["title"]}</a>',
                         unsafe_allow_html=True
                     )
@@ -279,6 +378,8 @@ def main():
 
         # Add link to history page in sidebar
         with st.sidebar:
+            if show_timings:
+                show_timings_panel()
             st.markdown(f"[📚 {get_text('view_history')}](/History)")
 
     except Exception as e:
@@ -287,3 +388,8 @@ def main():
 
 if __name__ == "__main__":
     main()
+
+    # ジョブの実行中は一定間隔で再実行して状態を確認する
+    if st.session_state.get('job_id'):
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
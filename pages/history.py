@@ -1,11 +1,15 @@
 import streamlit as st
 import os
-from utils.db_handler import DatabaseHandler
+from utils.db_handler import get_database_handler
+from utils.thumbnail_cache import get_thumbnail_cache, ThumbnailCache
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 1ページあたりの表示件数
+PAGE_SIZE = 10
+
 # Translations dictionary
 TRANSLATIONS = {
     'ja': {
@@ -21,7 +25,17 @@ TRANSLATIONS = {
         'db_error': 'データベースエラーが発生しました：',
         'loading': '読み込み中...',
         'view_video': '動画を見る',
-        'summary_label': '要約：'
+        'summary_label': '要約：',
+        'show_summary': '要約を表示',
+        'newer_page': '← 新しい要約',
+        'older_page': '古い要約 →',
+        'page_label': '{page}ページ目',
+        'select_label': '選択',
+        'delete_selected': '選択した要約を削除（{count}件）',
+        'bulk_delete_success': '{count}件の要約を削除しました',
+        'search_label': '要約を検索',
+        'search_placeholder': 'キーワードを入力',
+        'no_search_results': '一致する要約が見つかりませんでした'
     },
     'en': {
         'page_title': 'Summary History',
@@ -36,7 +50,17 @@ TRANSLATIONS = {
         'db_error': 'Database error occurred: ',
         'loading': 'Loading...',
         'view_video': 'Watch Video',
-        'summary_label': 'Summary:'
+        'summary_label': 'Summary:',
+        'show_summary': 'Show summary',
+        'newer_page': '← Newer',
+        'older_page': 'Older →',
+        'page_label': 'Page {page}',
+        'select_label': 'Select',
+        'delete_selected': 'Delete selected ({count})',
+        'bulk_delete_success': 'Deleted {count} summaries',
+        'search_label': 'Search summaries',
+        'search_placeholder': 'Enter keywords',
+        'no_search_results': 'No matching summaries found'
     },
     'zh': {
         'page_title': '摘要历史',
@@ -51,7 +75,17 @@ TRANSLATIONS = {
         'db_error': '数据库错误：',
         'loading': '加载中...',
         'view_video': '观看视频',
-        'summary_label': '摘要：'
+        'summary_label': '摘要：',
+        'show_summary': '显示摘要',
+        'newer_page': '← 较新',
+        'older_page': '较旧 →',
+        'page_label': '第{page}页',
+        'select_label': '选择',
+        'delete_selected': '删除所选摘要（{count}个）',
+        'bulk_delete_success': '已删除{count}个摘要',
+        'search_label': '搜索摘要',
+        'search_placeholder': '输入关键词',
+        'no_search_results': '未找到匹配的摘要'
     }
 }
 
@@ -59,29 +93,122 @@ def get_text(key: str) -> str:
     """Get translated text based on current language."""
     return TRANSLATIONS[st.session_state.language].get(key, key)
 
+def delete_summaries(summary_ids: list):
+    """Delete summaries in one request (button callback, runs before the rerun)."""
+    deleted_ids, message = st.session_state.db_handler.delete_summaries(summary_ids)
+    if deleted_ids:
+        if len(deleted_ids) == 1:
+            st.session_state.delete_message = ('success', get_text('delete_success'))
+        else:
+            st.session_state.delete_message = (
+                'success', get_text('bulk_delete_success').format(count=len(deleted_ids))
+            )
+    else:
+        st.session_state.delete_message = ('error', f"{get_text('delete_error')}{message}")
+
+    for summary_id in summary_ids:
+        st.session_state.delete_confirmation.pop(summary_id, None)
+        st.session_state.summary_bodies.pop(summary_id, None)
+        st.session_state.selected_summaries.discard(summary_id)
+
+def toggle_selection(summary_id: int):
+    """Add or remove a summary from the bulk delete selection."""
+    if st.session_state[f"select_{summary_id}"]:
+        st.session_state.selected_summaries.add(summary_id)
+    else:
+        st.session_state.selected_summaries.discard(summary_id)
+
+def set_delete_confirmation(summary_id: int, value: bool):
+    st.session_state.delete_confirmation[summary_id] = value
+
 def delete_summary(summary_id: int):
     """Delete a summary and handle the confirmation dialog."""
     if summary_id not in st.session_state.delete_confirmation:
         st.session_state.delete_confirmation[summary_id] = False
 
-    if st.button(get_text('delete_button'), key=f"delete_{summary_id}"):
-        st.session_state.delete_confirmation[summary_id] = True
+    st.checkbox(
+        get_text('select_label'),
+        value=summary_id in st.session_state.selected_summaries,
+        key=f"select_{summary_id}",
+        on_change=toggle_selection,
+        args=(summary_id,)
+    )
+
+    st.button(get_text('delete_button'), key=f"delete_{summary_id}",
+              on_click=set_delete_confirmation, args=(summary_id, True))
 
     if st.session_state.delete_confirmation[summary_id]:
         col1, col2 = st.columns([1, 4])
         with col1:
-            if st.button(get_text('delete_confirm'), key=f"confirm_{summary_id}"):
-                success, message = st.session_state.db_handler.delete_summary(summary_id)
-                if success:
-                    st.success(get_text('delete_success'))
-                    st.session_state.delete_confirmation[summary_id] = False
-                    st.experimental_rerun()
-                else:
-                    st.error(f"{get_text('delete_error')}{message}")
+            st.button(get_text('delete_confirm'), key=f"confirm_{summary_id}",
+                      on_click=delete_summaries, args=([summary_id],))
         with col2:
-            if st.button(get_text('cancel_button'), key=f"cancel_{summary_id}"):
-                st.session_state.delete_confirmation[summary_id] = False
-                st.experimental_rerun()
+            st.button(get_text('cancel_button'), key=f"cancel_{summary_id}",
+                      on_click=set_delete_confirmation, args=(summary_id, False))
+
+def reset_pagination():
+    """Go back to the first page of the history list."""
+    # page_cursors[i] は i ページ目の取得に使うカーソル（先頭ページは None）
+    st.session_state.page_cursors = [None]
+    st.session_state.page_index = 0
+
+def show_newer_page():
+    """Go back one page (button callback, runs before the rerun)."""
+    st.session_state.page_index -= 1
+
+def show_older_page(next_cursor):
+    """Advance one page using the cursor returned with the current page (button callback)."""
+    del st.session_state.page_cursors[st.session_state.page_index + 1:]
+    st.session_state.page_cursors.append(next_cursor)
+    st.session_state.page_index += 1
+
+def get_summary_body(summary_id: int) -> str:
+    """Load a summary body on demand, caching it for this session."""
+    bodies = st.session_state.summary_bodies
+    if summary_id not in bodies:
+        bodies[summary_id] = st.session_state.db_handler.get_summary_body(summary_id) or ''
+    return bodies[summary_id]
+
+def render_summary_grid(summaries: list):
+    """Display summary cards in a two-column grid."""
+    # サムネイルはローカルキャッシュから縮小版をまとめて取得する
+    thumbnails = get_thumbnail_cache().get_many(
+        [summary.thumbnail_url for summary in summaries],
+        ThumbnailCache.CARD_WIDTH
+    )
+
+    # Display summaries in a grid layout
+    cols = st.columns(2)  # 2列のグリッドレイアウト
+    for idx, summary in enumerate(summaries):
+        with cols[idx % 2]:
+            with st.container():
+                # サムネイル画像とタイトルを表示（取得できない場合は元のURLを使う）
+                if summary.thumbnail_url:
+                    st.image(thumbnails.get(summary.thumbnail_url, summary.thumbnail_url),
+                             use_column_width=True)
+
+                # タイトルと日時
+                date_format = get_text('summary_date_format')
+                formatted_date = summary.timestamp.strftime(date_format)
+                st.markdown(f"### {summary.title}")
+                st.markdown(f"*{formatted_date}*")
+
+                # 要約内容（表示したときだけ本文を取得する）
+                if st.toggle(get_text('show_summary'), key=f"show_{summary.id}"):
+                    st.markdown(f"**{get_text('summary_label')}**")
+                    st.markdown(get_summary_body(summary.id))
+
+                # 動画リンクと削除ボタン
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    video_url = f"https://youtube.com/watch?v={summary.video_id}"
+                    st.markdown(f'<a href="{video_url}" target="_blank" class="video-link">'
+                              f'{get_text("view_video")}</a>', unsafe_allow_html=True)
+                with col2:
+                    delete_summary(summary.id)
+
+                # 区切り線
+                st.markdown("---")
 
 def initialize_session_state():
     """Initialize session state variables."""
@@ -89,11 +216,17 @@ def initialize_session_state():
         st.session_state.language = 'ja'
     if 'delete_confirmation' not in st.session_state:
         st.session_state.delete_confirmation = {}
+    if 'summary_bodies' not in st.session_state:
+        st.session_state.summary_bodies = {}
+    if 'selected_summaries' not in st.session_state:
+        st.session_state.selected_summaries = set()
+    if 'page_cursors' not in st.session_state:
+        reset_pagination()
 
     # Initialize database connection
     if 'db_handler' not in st.session_state:
         try:
-            st.session_state.db_handler = DatabaseHandler()
+            st.session_state.db_handler = get_database_handler()
         except Exception as e:
             st.error(f"{get_text('db_error')} {str(e)}")
             st.session_state.db_handler = None
@@ -118,52 +251,78 @@ def main():
         options=['ja', 'en', 'zh'],
         index=['ja', 'en', 'zh'].index(st.session_state.language),
         format_func=lambda x: '日本語' if x == 'ja' else 'English' if x == 'en' else '中文',
-        key='language'
+        key='language',
+        on_change=reset_pagination
     )
 
     if st.session_state.db_handler is None:
         st.error(get_text('db_error'))
         return
 
+    # 削除結果（ボタンのコールバックで設定される）
+    if st.session_state.get('delete_message'):
+        level, message = st.session_state.pop('delete_message')
+        if level == 'success':
+            st.success(message)
+        else:
+            st.error(message)
+
+    # 選択した要約の一括削除
+    if st.session_state.selected_summaries:
+        selected = sorted(st.session_state.selected_summaries)
+        st.button(
+            get_text('delete_selected').format(count=len(selected)),
+            key='delete_selected',
+            on_click=delete_summaries,
+            args=(selected,)
+        )
+
+    # 全文検索（入力がある場合はページ送りの代わりに検索結果を表示する）
+    search_query = st.text_input(
+        get_text('search_label'),
+        placeholder=get_text('search_placeholder'),
+        key='search_query'
+    ).strip()
+    if search_query:
+        with st.spinner(get_text('loading')):
+            results = st.session_state.db_handler.search_summaries(
+                search_query,
+                st.session_state.language
+            )
+        if results:
+            render_summary_grid(results)
+        else:
+            st.info(get_text('no_search_results'))
+        return
+
     with st.spinner(get_text('loading')):
-        summaries = st.session_state.db_handler.get_summaries_by_language(
-            st.session_state.language
+        cursor = st.session_state.page_cursors[st.session_state.page_index]
+        summaries, next_cursor = st.session_state.db_handler.get_summaries_page(
+            st.session_state.language,
+            limit=PAGE_SIZE,
+            cursor=cursor
         )
 
         if not summaries:
+            if st.session_state.page_index > 0:
+                # 削除等で現在のページが空になった場合は先頭に戻る
+                reset_pagination()
+                st.rerun()
             st.info(get_text('no_summaries'))
             return
 
-        # Display summaries in a grid layout
-        cols = st.columns(2)  # 2列のグリッドレイアウト
-        for idx, summary in enumerate(summaries):
-            with cols[idx % 2]:
-                with st.container():
-                    # サムネイル画像とタイトルを表示
-                    if summary.thumbnail_url:
-                        st.image(summary.thumbnail_url, use_column_width=True)
-
-                    # タイトルと日時
-                    date_format = get_text('summary_date_format')
-                    formatted_date = summary.timestamp.strftime(date_format)
-                    st.markdown(f"### {summary.title}")
-                    st.markdown(f"*{formatted_date}*")
-
-                    # 要約内容
-                    st.markdown(f"**{get_text('summary_label')}**")
-                    st.markdown(summary.summary)
-
-                    # 動画リンクと削除ボタン
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        video_url = f"https://youtube.com/watch?v={summary.video_id}"
-                        st.markdown(f'<a href="{video_url}" target="_blank" class="video-link">'
-                                  f'{get_text("view_video")}</a>', unsafe_allow_html=True)
-                    with col2:
-                        delete_summary(summary.id)
-
-                    # 区切り線
-                    st.markdown("---")
+        render_summary_grid(summaries)
+
+    # ページ送り
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.session_state.page_index > 0:
+            st.button(get_text('newer_page'), on_click=show_newer_page)
+    with col2:
+        st.markdown(get_text('page_label').format(page=st.session_state.page_index + 1))
+    with col3:
+        if next_cursor:
+            st.button(get_text('older_page'), on_click=show_older_page, args=(next_cursor,))
 
 if __name__ == "__main__":
     main()
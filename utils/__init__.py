@@ -1,4 +1,22 @@
-from .youtube_handler import YouTubeHandler
-from .gemini_processor import GeminiProcessor
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .youtube_handler import YouTubeHandler
+    from .gemini_processor import GeminiProcessor
+
+# ハンドラーは属性として参照されたときに読み込む（起動時の import を軽くするため）
+_LAZY_ATTRIBUTES = {
+    'YouTubeHandler': '.youtube_handler',
+    'GeminiProcessor': '.gemini_processor'
+}
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = ['YouTubeHandler', 'GeminiProcessor']
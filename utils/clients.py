@@ -0,0 +1,92 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import os
+import threading
+
+# YouTube Data API のクライアントの HTTP タイムアウト（秒）
+YOUTUBE_HTTP_TIMEOUT = 30
+
+@lru_cache(maxsize=1)
+def load_youtube_discovery_document() -> Optional[str]:
+    """Return the YouTube Data API v3 discovery document, read once per process.
+
+    Taken from YOUTUBE_DISCOVERY_DOC if set, otherwise from the copy bundled
+    with google-api-python-client. Returns None if neither is available.
+    """
+    path = os.environ.get('YOUTUBE_DISCOVERY_DOC')
+    if path:
+        return Path(path).read_text(encoding='utf-8')
+    from googleapiclient.discovery_cache import get_static_doc
+    return get_static_doc('youtube', 'v3')
+
+class ClientRegistry:
+    """Process-wide registry of YouTube and Gemini API clients.
+
+    googleapiclient services and their httplib2 transport are not thread-safe,
+    so YouTube clients are kept per thread and API key. Each one holds its own
+    keep-alive HTTP connection, reused by every request that thread handles.
+    Gemini models are thread-safe and shared by the whole process.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._gemini_models: Dict[Tuple[str, str], object] = {}
+        self._gemini_api_key: Optional[str] = None
+
+    def youtube(self, api_key: str):
+        """Return the YouTube Data API client for ``api_key`` owned by the current thread."""
+        clients = getattr(self._local, 'youtube', None)
+        if clients is None:
+            clients = self._local.youtube = {}
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = self._build_youtube(api_key)
+        return client
+
+    @staticmethod
+    def _build_youtube(api_key: str):
+        # googleapiclient は読み込みが重いため、最初にクライアントを作るときに読み込む
+        import httplib2
+        from googleapiclient.discovery import build, build_from_document
+
+        http = httplib2.Http(timeout=YOUTUBE_HTTP_TIMEOUT)
+        document = load_youtube_discovery_document()
+        if document is None:
+            # ディスカバリードキュメントが同梱されていない場合は取得する
+            return build('youtube', 'v3', developerKey=api_key, http=http, static_discovery=False)
+        return build_from_document(document, developerKey=api_key, http=http)
+
+    def gemini_model(self, api_key: str, model_name: str = 'gemini-pro'):
+        """Return the shared GenerativeModel for ``api_key``, configuring the SDK on first use.
+
+        genai.configure() sets process-global state, so it only runs when the
+        API key changes.
+        """
+        key = (api_key, model_name)
+        with self._lock:
+            model = self._gemini_models.get(key)
+            if model is not None:
+                return model
+
+            # google.generativeai は読み込みが重いため、使うときに読み込む
+            import google.generativeai as genai
+            if self._gemini_api_key != api_key:
+                genai.configure(api_key=api_key)
+                self._gemini_api_key = api_key
+                # 他のキーで作成済みのモデルは設定が変わるため作り直す
+                self._gemini_models.clear()
+            model = self._gemini_models[key] = genai.GenerativeModel(model_name)
+            return model
+
+_shared_registry: Optional[ClientRegistry] = None
+_shared_registry_lock = threading.Lock()
+
+def get_client_registry() -> ClientRegistry:
+    """Return the process-wide client registry."""
+    global _shared_registry
+    with _shared_registry_lock:
+        if _shared_registry is None:
+            _shared_registry = ClientRegistry()
+        return _shared_registry
@@ -1,13 +1,69 @@
 from datetime import datetime
+from pathlib import Path
+import atexit
+import hashlib
+import json
+import logging
 import os
-from supabase.client import create_client, Client
-from typing import List, Optional, Tuple
+import queue
+import sys
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import traceback
-import streamlit as st
+from .search_index import SummarySearchIndex
+from .metrics import incr, span
+
+if TYPE_CHECKING:
+    from supabase.client import Client
+
+logger = logging.getLogger(__name__)
+
+class StatusReporter:
+    """Report status messages to the Streamlit page when running inside the app.
+
+    Messages always go to logging. They are also shown with st.error /
+    st.info / st.success when streamlit has already been imported by the
+    host process and the call happens on a script thread, so headless
+    callers (CLI, background workers) never import streamlit.
+    """
+
+    def _streamlit(self):
+        st = sys.modules.get('streamlit')
+        if st is None:
+            return None
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+        except ImportError:
+            return None
+        # ジョブや書き込みキューのスレッドから呼ばれるため、コンテキストがない警告は抑止する
+        return st if get_script_run_ctx(suppress_warning=True) is not None else None
+
+    def error(self, message: str):
+        logger.error(message)
+        st = self._streamlit()
+        if st:
+            st.error(message)
+
+    def info(self, message: str):
+        logger.info(message)
+        st = self._streamlit()
+        if st:
+            st.info(message)
+
+    def success(self, message: str):
+        logger.info(message)
+        st = self._streamlit()
+        if st:
+            st.success(message)
+
+status = StatusReporter()
 
 class VideoSummary:
-    def __init__(self, id: int, video_id: str, title: str, summary: str, 
-                 language: str, timestamp: datetime, source_urls: str,
+    # summary と source_urls は一覧取得（列を絞ったクエリ）では None になる
+    def __init__(self, id: int, video_id: str, title: str, summary: Optional[str], 
+                 language: str, timestamp: datetime, source_urls: Optional[str],
                  thumbnail_url: Optional[str] = None):
         self.id = id
         self.video_id = video_id
@@ -18,74 +74,444 @@ class VideoSummary:
         self.source_urls = source_urls
         self.thumbnail_url = thumbnail_url
 
+def compute_source_hash(video_ids: List[str], language: str, prompt_version: str) -> str:
+    """Build the canonical cache key for a summary.
+
+    The key covers the sorted, de-duplicated video IDs, the output language
+    and the prompt template version, so the same request always maps to the
+    same stored summary regardless of URL order.
+    """
+    canonical = '|'.join([','.join(sorted(set(video_ids))), language, prompt_version])
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class SummaryWriteQueue:
+    """Write-behind queue that persists summaries in the background.
+
+    Rows are collected by a worker thread and written with a single bulk
+    insert per batch, retrying with exponential backoff. When the database
+    rejects a batch because of its contents, the batch is bisected so that
+    only the offending rows go to the dead-letter file. Batches that still
+    fail for other reasons are appended to a local JSONL spill file and
+    replayed when the queue starts or a batch succeeds. Pending rows are
+    flushed at interpreter shutdown.
+    """
+
+    DEFAULT_BATCH_SIZE = 200
+    DEFAULT_FLUSH_INTERVAL = 0.5
+    DEFAULT_MAX_RETRIES = 5
+    DEFAULT_SPILL_PATH = '.cache/pending_summaries.jsonl'
+    DEFAULT_DEAD_LETTER_PATH = '.cache/failed_summaries.jsonl'
+    # 行の内容に起因し、再送しても成功しないエラーの SQLSTATE クラス（22: データ例外、23: 制約違反）。
+    # スキーマや権限のエラーは設定を直せば書き込めるため、退避して後で再送する
+    ROW_ERROR_CODE_PREFIXES = ('22', '23')
+
+    def __init__(self, handler: 'DatabaseHandler',
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 spill_path: Optional[str] = None,
+                 dead_letter_path: Optional[str] = None):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.spill_path = Path(spill_path or os.environ.get('SUMMARY_SPILL_PATH', self.DEFAULT_SPILL_PATH))
+        self.dead_letter_path = Path(dead_letter_path or os.environ.get(
+            'SUMMARY_DEAD_LETTER_PATH', self.DEFAULT_DEAD_LETTER_PATH))
+        self._queue: queue.Queue = queue.Queue()
+        self._spill_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name='summary-write-queue', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, row: Dict):
+        """Queue a row for insertion."""
+        self._queue.put(row)
+
+    def flush(self):
+        """Block until every queued row has been written, spilled or dead-lettered."""
+        self._queue.join()
+
+    def close(self):
+        """Stop the worker after writing all queued rows."""
+        if self._stopped.is_set():
+            return
+        self.flush()
+        self._stopped.set()
+        self._thread.join(timeout=self.flush_interval * 2)
+
+    def _run(self):
+        # 前回までに退避した行を書き込む（失敗してもワーカーは止めない）
+        self._replay_spill_safely()
+        while not self._stopped.is_set():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            # 待機中の行をまとめて1回の insert で書き込む
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                stored = self._write_rows(batch)
+            except Exception:
+                # 退避ファイルへの書き込みにも失敗した場合。ワーカーを止めると flush() が戻らなくなる
+                stored = 0
+                logger.exception("Could not write or spill %d summaries (video_ids: %s)",
+                                 len(batch), ','.join(str(row.get('video_id')) for row in batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            # 接続が回復したら以前に退避した行も書き込む
+            if stored:
+                self._replay_spill_safely()
+
+    def _is_row_error(self, error: Exception) -> bool:
+        """Whether the database rejected the rows themselves (retrying cannot help)."""
+        code = str(getattr(error, 'code', None) or '')
+        return code.startswith(self.ROW_ERROR_CODE_PREFIXES)
+
+    def _insert(self, rows: List[Dict]) -> Optional[Exception]:
+        """Insert rows with retries; return the last error, or None on success."""
+        for attempt in range(self.max_retries):
+            try:
+                self.handler.insert_summaries(rows)
+                return None
+            except Exception as e:
+                if self._is_row_error(e) or attempt == self.max_retries - 1:
+                    return e
+                incr('db_write_retries')
+                time.sleep(min(0.5 * 2 ** attempt, 30))
+
+    def _write_rows(self, rows: List[Dict]) -> int:
+        """Write rows, isolating rejected rows by bisection; return how many were stored.
+
+        Rejected rows go to the dead-letter file and rows that failed for
+        any other reason to the spill file.
+        """
+        error = self._insert(rows)
+        if error is None:
+            return len(rows)
+        if not self._is_row_error(error):
+            incr('db_rows_spilled', len(rows))
+            self._spill(rows)
+            return 0
+        if len(rows) == 1:
+            incr('db_rows_dead_lettered')
+            logger.error("Summary rejected by the database (video_id: %s): %s", rows[0].get('video_id'), error)
+            self._dead_letter(rows[0], str(error))
+            return 0
+        # 1行の不正でバッチ全体が失敗するため、半分に分けて正常な行だけを書き込む
+        middle = len(rows) // 2
+        return self._write_rows(rows[:middle]) + self._write_rows(rows[middle:])
+
+    def _append_lines(self, path: Path, lines: List[str]):
+        with self._spill_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _spill(self, rows: List[Dict]):
+        """Append rows that could not be written to the spill file."""
+        self._append_lines(self.spill_path, [json.dumps(row, ensure_ascii=False) for row in rows])
+
+    def _dead_letter(self, row: Optional[Dict], error: str, raw: Optional[str] = None):
+        """Record a row (or an unreadable spill line) that will never be written, with the reason."""
+        record = {'error': error, 'failed_at': datetime.utcnow().isoformat()}
+        if row is not None:
+            record['row'] = row
+        else:
+            record['raw'] = raw
+        self._append_lines(self.dead_letter_path, [json.dumps(record, ensure_ascii=False)])
+
+    def _claim_spill_files(self) -> List[Path]:
+        """Take over the spill file and any files left claimed by processes that have exited."""
+        claimed = []
+        with self._spill_lock:
+            # 他のプロセスと重複して再送しないよう、ファイルを移動してから読み込む
+            sources = [self.spill_path]
+            for path in self.spill_path.parent.glob(f"{self.spill_path.name}.*"):
+                owner = path.name[len(self.spill_path.name) + 1:].split('.', 1)[0]
+                if owner.isdigit() and not _process_alive(int(owner)):
+                    sources.append(path)
+            for source in sources:
+                target = self.spill_path.with_name(f"{self.spill_path.name}.{os.getpid()}.{uuid.uuid4().hex}")
+                try:
+                    os.replace(source, target)
+                except OSError:
+                    # 存在しないか、別のプロセスが先に引き取った
+                    continue
+                claimed.append(target)
+        return claimed
+
+    def _replay_spill_safely(self):
+        try:
+            self._replay_spill()
+        except Exception:
+            logger.exception("Could not replay spilled summaries from %s", self.spill_path)
+
+    def _replay_spill(self):
+        """Write rows from the spill file.
+
+        A claimed file is deleted only after each of its rows has been
+        stored, spilled again or dead-lettered; lines that cannot be parsed
+        are dead-lettered.
+        """
+        for claimed in self._claim_spill_files():
+            rows = []
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        # 書き込み途中で終了した行など
+                        self._dead_letter(None, f"Unreadable spill line: {e}", raw=line.rstrip('\n'))
+            for start in range(0, len(rows), self.batch_size):
+                self._write_rows(rows[start:start + self.batch_size])
+            claimed.unlink()
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 権限がない場合などは存在するものとして扱う
+        return True
+    return True
+
+class _LocalIndex:
+    """Local search index of one language and how far it has been synced."""
+
+    def __init__(self, language: str):
+        self.index = SummarySearchIndex(language)
+        # 索引済みの最大ID（IDは挿入順に増えるため、次回はこれより大きい行だけを取得する）
+        self.last_id: Optional[int] = None
+        self.synced_at: Optional[float] = None
+        self.sync_lock = threading.Lock()
+
+    def is_stale(self, ttl_seconds: float) -> bool:
+        return self.synced_at is None or time.monotonic() - self.synced_at >= ttl_seconds
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+_shared_handler: Optional['DatabaseHandler'] = None
+
+def get_shared_client(supabase_url: str, supabase_key: str) -> 'Client':
+    """Return the process-wide Supabase client for the given credentials."""
+    with _shared_lock:
+        key = (supabase_url, supabase_key)
+        if key not in _shared_clients:
+            # supabase は読み込みが重いため、最初の接続時に読み込む
+            from supabase.client import create_client
+            _shared_clients[key] = create_client(supabase_url, supabase_key)
+        return _shared_clients[key]
+
+def get_database_handler() -> 'DatabaseHandler':
+    """Return the process-wide DatabaseHandler shared by all sessions."""
+    global _shared_handler
+    with _shared_lock:
+        handler = _shared_handler
+    if handler is None:
+        # 初期化中に接続確認を行うため、ロックの外で生成する
+        handler = DatabaseHandler()
+        with _shared_lock:
+            if _shared_handler is None:
+                _shared_handler = handler
+            handler = _shared_handler
+    return handler
+
 class DatabaseHandler:
+    # 成功した通信からこの秒数の間は、接続確認のクエリを省略する
+    HEALTH_TTL_SECONDS = 300
+    # 履歴一覧で取得する列（要約本文は展開時に get_summary_body で取得する）
+    LIST_COLUMNS = 'id,title,video_id,thumbnail_url,timestamp'
+    # search_summaries のRPCが使えない場合に、ローカル索引へ新しい行を取り込む間隔と1回の取得件数
+    LOCAL_INDEX_TTL_SECONDS = 60
+    LOCAL_INDEX_PAGE_SIZE = 1000
+    # RPC が未定義であることを示すエラーコード（PostgREST のスキーマキャッシュ、PostgreSQL の undefined_function）
+    MISSING_RPC_ERROR_CODES = ('PGRST202', '42883')
+
     def __init__(self):
+        self._healthy_until = 0.0
+        self._write_queue: Optional[SummaryWriteQueue] = None
+        self._write_queue_lock = threading.Lock()
+        # 言語ごとのローカル検索索引
+        self._local_indexes: Dict[str, _LocalIndex] = {}
+        self._local_index_lock = threading.Lock()
         try:
             supabase_url = os.environ.get('SUPABASE_URL')
             supabase_key = os.environ.get('SUPABASE_KEY')
 
             if not supabase_url or not supabase_key:
-                st.error("Supabase credentials not found in environment variables")
+                status.error("Supabase credentials not found in environment variables")
                 raise ValueError("Supabase credentials not found in environment variables")
 
-            st.info("Initializing Supabase client...")
-            self.client = create_client(supabase_url, supabase_key)
+            status.info("Initializing Supabase client...")
+            self.client = get_shared_client(supabase_url, supabase_key)
 
             # Test connection
             if not self.verify_connection():
-                st.error("Failed to verify database connection")
+                status.error("Failed to verify database connection")
                 raise Exception("Database connection verification failed")
 
-            st.success("Database connected successfully")
+            status.success("Database connected successfully")
 
         except Exception as e:
-            st.error(f"Database initialization error: {str(e)}")
-            st.error(f"Stack trace: {traceback.format_exc()}")
+            status.error(f"Database initialization error: {str(e)}")
+            status.error(f"Stack trace: {traceback.format_exc()}")
             raise Exception(f"Failed to initialize database connection: {str(e)}")
 
+    def _mark_healthy(self):
+        """Record a successful round trip; skips probes until the health TTL expires."""
+        self._healthy_until = time.monotonic() + self.HEALTH_TTL_SECONDS
+
+    def _mark_unhealthy(self):
+        """Force a probe before the next operation."""
+        self._healthy_until = 0.0
+
+    def ensure_connection(self) -> bool:
+        """Check the connection, probing the database only when its health is unknown."""
+        if time.monotonic() < self._healthy_until:
+            return True
+        return self.verify_connection()
+
     def verify_connection(self) -> bool:
         """Verify database connection is active."""
         try:
             # Use from_ instead of table for Supabase client
             response = self.client.from_('video_summaries').select('id').limit(1).execute()
+            self._mark_healthy()
             return True
         except Exception as e:
-            st.error(f"Connection verification failed: {str(e)}")
-            st.error(f"Stack trace: {traceback.format_exc()}")
+            self._mark_unhealthy()
+            status.error(f"Connection verification failed: {str(e)}")
+            status.error(f"Stack trace: {traceback.format_exc()}")
             return False
 
+    def _build_summary_row(self, video_id: str, title: str, summary: str,
+                           language: str, source_urls: str, thumbnail_url: Optional[str] = None,
+                           source_hash: Optional[str] = None) -> Dict:
+        """Build a video_summaries row."""
+        return {
+            "video_id": video_id,
+            "title": title,
+            "summary": summary,
+            "language": language,
+            "source_urls": source_urls,
+            "thumbnail_url": thumbnail_url,
+            "source_hash": source_hash,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
     def save_summary(self, video_id: str, title: str, summary: str, 
-                    language: str, source_urls: str, thumbnail_url: Optional[str] = None) -> bool:
+                    language: str, source_urls: str, thumbnail_url: Optional[str] = None,
+                    source_hash: Optional[str] = None) -> bool:
         """Save a video summary to the database."""
         try:
-            if not self.verify_connection():
-                st.error("Database connection is not active")
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
                 raise Exception("Database connection is not active")
 
-            data = {
-                "video_id": video_id,
-                "title": title,
-                "summary": summary,
-                "language": language,
-                "source_urls": source_urls,
-                "thumbnail_url": thumbnail_url,
-                "timestamp": datetime.utcnow().isoformat()
-            }
+            data = self._build_summary_row(video_id, title, summary, language,
+                                           source_urls, thumbnail_url, source_hash)
 
             # Use from_ instead of table for Supabase client
-            response = self.client.from_('video_summaries').insert(data).execute()
+            with span('save_summary'):
+                response = self.client.from_('video_summaries').insert(data).execute()
+            self._mark_healthy()
             return True
 
         except Exception as e:
-            st.error(f"Error saving summary: {str(e)}")
-            st.error(f"Stack trace: {traceback.format_exc()}")
+            self._mark_unhealthy()
+            status.error(f"Error saving summary: {str(e)}")
+            status.error(f"Stack trace: {traceback.format_exc()}")
             raise Exception(f"Database error: {str(e)}")
 
+    def insert_summaries(self, rows: List[Dict]) -> int:
+        """Insert many summary rows with a single bulk insert.
+
+        Runs on the write-queue thread, so errors are raised rather than
+        reported through Streamlit.
+        """
+        if not rows:
+            return 0
+        try:
+            with span('insert_summaries', rows=len(rows)):
+                response = self.client.from_('video_summaries').insert(rows).execute()
+            self._mark_healthy()
+            return len(response.data) if response.data else len(rows)
+        except Exception:
+            self._mark_unhealthy()
+            raise
+
+    def save_summary_async(self, video_id: str, title: str, summary: str,
+                           language: str, source_urls: str, thumbnail_url: Optional[str] = None,
+                           source_hash: Optional[str] = None):
+        """Queue a summary for a background batched insert and return immediately."""
+        with self._write_queue_lock:
+            if self._write_queue is None:
+                self._write_queue = SummaryWriteQueue(self)
+        self._write_queue.put(self._build_summary_row(video_id, title, summary, language,
+                                                      source_urls, thumbnail_url, source_hash))
+
+    def flush_pending_writes(self):
+        """Block until all summaries queued by save_summary_async are written or spilled."""
+        if self._write_queue is not None:
+            self._write_queue.flush()
+
+    def get_summary_by_hash(self, source_hash: str) -> Optional[VideoSummary]:
+        """Get the latest summary stored under a source hash, if any."""
+        try:
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
+                return None
+
+            response = self.client.from_('video_summaries')\
+                .select('*')\
+                .eq('source_hash', source_hash)\
+                .order('timestamp', desc=True)\
+                .limit(1)\
+                .execute()
+            self._mark_healthy()
+
+            if not response.data:
+                return None
+
+            item = response.data[0]
+            return VideoSummary(
+                id=item['id'],
+                video_id=item['video_id'],
+                title=item['title'],
+                summary=item['summary'],
+                language=item['language'],
+                timestamp=datetime.fromisoformat(item['timestamp']),
+                source_urls=item['source_urls'],
+                thumbnail_url=item.get('thumbnail_url')
+            )
+
+        except Exception as e:
+            self._mark_unhealthy()
+            status.error(f"Error in get_summary_by_hash: {str(e)}")
+            return None
+
     def get_recent_summaries(self, limit: int = 10) -> List[VideoSummary]:
         """Get recent summaries from the database."""
         try:
-            if not self.verify_connection():
-                st.error("Database connection is not active")
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
                 return []
 
             # Use from_ instead of table for Supabase client
@@ -94,6 +520,7 @@ class DatabaseHandler:
                 .order('timestamp', desc=True)\
                 .limit(limit)\
                 .execute()
+            self._mark_healthy()
 
             return [
                 VideoSummary(
@@ -110,15 +537,16 @@ class DatabaseHandler:
             ] if response.data else []
 
         except Exception as e:
-            st.error(f"Error in get_recent_summaries: {str(e)}")
+            self._mark_unhealthy()
+            status.error(f"Error in get_recent_summaries: {str(e)}")
             return []
 
     def get_summaries_by_language(self, language: str, 
                                 limit: int = 10) -> List[VideoSummary]:
         """Get summaries filtered by language."""
         try:
-            if not self.verify_connection():
-                st.error("Database connection is not active")
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
                 return []
 
             # Use from_ instead of table for Supabase client
@@ -128,6 +556,7 @@ class DatabaseHandler:
                 .order('timestamp', desc=True)\
                 .limit(limit)\
                 .execute()
+            self._mark_healthy()
 
             return [
                 VideoSummary(
@@ -144,44 +573,250 @@ class DatabaseHandler:
             ] if response.data else []
 
         except Exception as e:
-            st.error(f"Error in get_summaries_by_language: {str(e)}")
+            self._mark_unhealthy()
+            status.error(f"Error in get_summaries_by_language: {str(e)}")
             return []
 
-    def delete_summary(self, summary_id: int) -> Tuple[bool, str]:
-        """Delete a summary from the database.
+    def get_summaries_page(self, language: str, limit: int = 10,
+                           cursor: Optional[Tuple[str, int]] = None
+                           ) -> Tuple[List[VideoSummary], Optional[Tuple[str, int]]]:
+        """Get one page of summaries for the history list using keyset pagination.
 
-        Args:
-            summary_id: The ID of the summary to delete
+        Only LIST_COLUMNS are selected, so the returned summaries have no
+        body. Rows are ordered by (timestamp, id) descending and ``cursor`` is
+        the (timestamp, id) of the last row of the previous page, so every
+        page costs the same regardless of how deep it is.
 
         Returns:
-            Tuple[bool, str]: (Success status, Message)
+            Tuple[List[VideoSummary], Optional[Tuple[str, int]]]: (Summaries, cursor for the next page or None)
         """
         try:
-            if not self.verify_connection():
-                return False, "Database connection is not active"
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
+                return [], None
+
+            query = self.client.from_('video_summaries')\
+                .select(self.LIST_COLUMNS)\
+                .eq('language', language)
+
+            if cursor:
+                timestamp, last_id = cursor
+                query = query.or_(
+                    f'timestamp.lt."{timestamp}",and(timestamp.eq."{timestamp}",id.lt.{last_id})'
+                )
+
+            # 次のページの有無を判定するため1件多く取得する
+            response = query\
+                .order('timestamp', desc=True)\
+                .order('id', desc=True)\
+                .limit(limit + 1)\
+                .execute()
+            self._mark_healthy()
+
+            rows = response.data or []
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = (rows[-1]['timestamp'], rows[-1]['id'])
+
+            return [self._list_row_to_summary(item, language) for item in rows], next_cursor
+
+        except Exception as e:
+            self._mark_unhealthy()
+            status.error(f"Error in get_summaries_page: {str(e)}")
+            return [], None
+
+    def get_summary_body(self, summary_id: int) -> Optional[str]:
+        """Get the summary text of a single summary."""
+        try:
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
+                return None
 
-            # First verify the summary exists
             response = self.client.from_('video_summaries')\
-                .select('id')\
+                .select('summary')\
                 .eq('id', summary_id)\
+                .limit(1)\
                 .execute()
+            self._mark_healthy()
 
-            if not response.data:
-                return False, "Summary not found"
+            return response.data[0]['summary'] if response.data else None
+
+        except Exception as e:
+            self._mark_unhealthy()
+            status.error(f"Error in get_summary_body: {str(e)}")
+            return None
+
+    def _list_row_to_summary(self, item: Dict, language: str) -> VideoSummary:
+        return VideoSummary(
+            id=item['id'],
+            video_id=item['video_id'],
+            title=item['title'],
+            summary=None,
+            language=language,
+            timestamp=datetime.fromisoformat(item['timestamp']),
+            source_urls=None,
+            thumbnail_url=item.get('thumbnail_url')
+        )
+
+    def search_summaries(self, query: str, language: str, limit: int = 20) -> List[VideoSummary]:
+        """Full-text search over stored summaries of one language.
+
+        Uses the search_summaries RPC from db/migration.sql (tsvector for en,
+        character bigrams for ja/zh, both GIN-indexed). If the backend does
+        not define it, falls back to an in-memory SummarySearchIndex that is
+        kept in sync incrementally by row ID; other errors return no results. Results
+        carry LIST_COLUMNS only, like get_summaries_page.
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        try:
+            if not self.ensure_connection():
+                status.error("Database connection is not active")
+                return []
+
+            response = self.client.rpc('search_summaries', {
+                'search_query': query,
+                'search_language': language,
+                'max_results': limit
+            }).execute()
+            self._mark_healthy()
+            return [self._list_row_to_summary(item, language) for item in response.data or []]
+
+        except Exception as e:
+            # RPC が未定義のバックエンド（ローカル・オフライン環境）に限りローカル索引を使う
+            if self._is_missing_rpc(e):
+                return self._search_local_index(query, language, limit)
+            self._mark_unhealthy()
+            status.error(f"Error in search_summaries: {str(e)}")
+            return []
 
-            # Delete the summary
+    @classmethod
+    def _is_missing_rpc(cls, error: Exception) -> bool:
+        """Whether an RPC failed because the function is not defined on the backend."""
+        code = str(getattr(error, 'code', None) or '')
+        return code in cls.MISSING_RPC_ERROR_CODES or 'Could not find the function' in str(error)
+
+    def _search_local_index(self, query: str, language: str, limit: int) -> List[VideoSummary]:
+        try:
+            index = self._get_local_index(language)
+            doc_ids = index.search(query, limit)
+            if not doc_ids:
+                return []
+
+            # 他のプロセスで削除された行を除くため、一覧用の列は検索結果の分だけ取得する
+            response = self.client.from_('video_summaries')\
+                .select(self.LIST_COLUMNS)\
+                .in_('id', doc_ids)\
+                .execute()
+            self._mark_healthy()
+            rows = {item['id']: item for item in response.data or []}
+            for doc_id in doc_ids:
+                if doc_id not in rows:
+                    index.remove(doc_id)
+            return [self._list_row_to_summary(rows[doc_id], language)
+                    for doc_id in doc_ids if doc_id in rows]
+        except Exception as e:
+            self._mark_unhealthy()
+            status.error(f"Error in search_summaries: {str(e)}")
+            return []
+
+    def _get_local_index(self, language: str) -> SummarySearchIndex:
+        """Return the local search index of a language, indexing rows added since the last sync when stale.
+
+        Only the first build blocks searches; while another thread syncs a
+        stale index, the current one is used as is.
+        """
+        with self._local_index_lock:
+            local = self._local_indexes.get(language)
+            if local is None:
+                local = self._local_indexes[language] = _LocalIndex(language)
+
+        if not local.is_stale(self.LOCAL_INDEX_TTL_SECONDS):
+            return local.index
+        if not local.sync_lock.acquire(blocking=local.synced_at is None):
+            return local.index
+        try:
+            if local.is_stale(self.LOCAL_INDEX_TTL_SECONDS):
+                self._sync_local_index(local, language)
+        finally:
+            local.sync_lock.release()
+        return local.index
+
+    def _sync_local_index(self, local: '_LocalIndex', language: str):
+        """Index the rows whose ID is above the last indexed one."""
+        while True:
+            query = self.client.from_('video_summaries')\
+                .select('id,title,summary,timestamp')\
+                .eq('language', language)
+            if local.last_id is not None:
+                query = query.gt('id', local.last_id)
+            response = query.order('id').limit(self.LOCAL_INDEX_PAGE_SIZE).execute()
+            self._mark_healthy()
+
+            for item in response.data or []:
+                local.index.add(item['id'], f"{item['title']} {item['summary']}",
+                                datetime.fromisoformat(item['timestamp']))
+            if response.data:
+                local.last_id = response.data[-1]['id']
+            if not response.data or len(response.data) < self.LOCAL_INDEX_PAGE_SIZE:
+                break
+        local.synced_at = time.monotonic()
+
+    def delete_summaries(self, summary_ids: List[int]) -> Tuple[List[int], str]:
+        """Delete many summaries with a single request.
+
+        Args:
+            summary_ids: The IDs of the summaries to delete
+
+        Returns:
+            Tuple[List[int], str]: (IDs that were actually deleted, Message)
+        """
+        if not summary_ids:
+            return [], "No summaries selected"
+
+        try:
+            if not self.ensure_connection():
+                return [], "Database connection is not active"
+
+            # 削除された行が返されるため、存在確認のクエリは不要
             response = self.client.from_('video_summaries')\
                 .delete()\
-                .eq('id', summary_id)\
+                .in_('id', list(summary_ids))\
                 .execute()
+            self._mark_healthy()
 
-            return True, "Summary deleted successfully"
+            deleted_ids = [item['id'] for item in response.data] if response.data else []
+            with self._local_index_lock:
+                for local in self._local_indexes.values():
+                    for summary_id in deleted_ids:
+                        local.index.remove(summary_id)
+            if not deleted_ids:
+                return [], "Summary not found"
+            return deleted_ids, f"{len(deleted_ids)} summaries deleted successfully"
 
         except Exception as e:
-            error_msg = f"Error deleting summary: {str(e)}"
-            st.error(error_msg)
-            st.error(f"Stack trace: {traceback.format_exc()}")
-            return False, error_msg
+            self._mark_unhealthy()
+            error_msg = f"Error deleting summaries: {str(e)}"
+            status.error(error_msg)
+            status.error(f"Stack trace: {traceback.format_exc()}")
+            return [], error_msg
+
+    def delete_summary(self, summary_id: int) -> Tuple[bool, str]:
+        """Delete a summary from the database.
+
+        Args:
+            summary_id: The ID of the summary to delete
+
+        Returns:
+            Tuple[bool, str]: (Success status, Message)
+        """
+        deleted_ids, message = self.delete_summaries([summary_id])
+        if not deleted_ids:
+            return False, message
+        return True, "Summary deleted successfully"
 
     def __del__(self):
         """Cleanup."""
@@ -1,54 +1,314 @@
-from typing import List, Dict
-import google.generativeai as genai
+from typing import List, Dict, Iterator, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from .rate_limiter import QuotaAccountant, get_quota_accountant
+from .metrics import in_context, incr, span
+from .clients import get_client_registry
+from .transcript import DEFAULT_MARKER_INTERVAL, TIMESTAMP_MARKER, Transcript, format_timestamp
 import re
 
+class StreamReset(str):
+    """Marker chunk telling consumers of generate_article_stream to discard the text received so far."""
+
+STREAM_RESET = StreamReset()
+
 class GeminiProcessor:
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+    # build_prompt のテンプレートを変更したら更新する（要約キャッシュのキーに含まれる）
+    PROMPT_VERSION = '3'
+    # プロンプト全体の入力トークン予算と、1動画あたりの最低保証トークン数
+    DEFAULT_INPUT_TOKEN_BUDGET = 16000
+    MIN_TOKENS_PER_VIDEO = 256
+
+    # 階層要約（map-reduce）の既定値
+    DEFAULT_CHUNK_CHARS = 6000
+    DEFAULT_MAX_WORKERS = 4
+    DEFAULT_MAX_DEPTH = 2
+
+    # 文字起こしの一部分（チャンク）を要約させるプロンプト
+    CHUNK_PROMPTS = {
+        'ja': "以下は動画「{title}」の文字起こしの一部（{index}/{total}）です。"
+              "重要なポイント、引用、数値を漏らさず、日本語で簡潔に要約してください。"
+              "[#1 12:34] 形式の時刻マーカーは、対応する内容の後にそのまま残してください。\n\n{text}",
+        'en': "The following is part {index} of {total} of the transcript of the video \"{title}\". "
+              "Summarize it concisely in English, keeping key points, quotes and figures. "
+              "Keep time markers such as [#1 12:34] next to the content they refer to.\n\n{text}",
+        'zh': "以下是视频《{title}》文字记录的一部分（{index}/{total}）。"
+              "请务必使用简体中文简明扼要地总结，保留要点、引用和数据。"
+              "[#1 12:34] 格式的时间标记请原样保留在对应内容之后。\n\n{text}"
+    }
+
+    # 文字起こしに時刻マーカーがある場合に、出典の時刻を引用させる指示
+    CITATION_INSTRUCTIONS = {
+        'ja': "文字起こし中の [#1 12:34] は動画番号と再生位置を示す時刻マーカーです。"
+              "主要なポイントには、根拠となる箇所の時刻マーカーを同じ形式で付けてください。",
+        'en': "Markers such as [#1 12:34] in the transcripts give the video number and playback position. "
+              "Cite the marker of the supporting passage in the same format after each key point.",
+        'zh': "文字记录中的 [#1 12:34] 是表示视频编号和播放位置的时间标记。"
+              "请在每个要点后按相同格式注明对应内容的时间标记。"
+    }
+
+    # 出力言語の判定に使う文字種と、スライディングウィンドウ内で必要な最低比率
+    # （ja は漢字だけでは中国語と区別できないため仮名の比率で判定する）
+    LANGUAGE_SCRIPTS = {
+        'zh': ('[\u4e00-\u9fff]', 0.5),
+        'ja': ('[\u3040-\u30ff]', 0.15),
+        'en': ('[A-Za-z]', 0.6)
+    }
+    # 判定に使う直近の文字数と、判定を始めるまでの最低文字数
+    DRIFT_WINDOW_LETTERS = 200
+    DRIFT_MIN_LETTERS = 40
+    # 言語がずれた場合の再生成で先頭に付ける指示
+    STRICT_LANGUAGE_PREFIXES = {
+        'zh': "务必使用简体中文回答。禁止使用其他语言。\n\n",
+        'ja': "必ず日本語で回答してください。他の言語は使用しないでください。\n\n",
+        'en': "You must answer in English only. Do not use any other language.\n\n"
+    }
+
+    # レート制限の計算に使う、1リクエストあたりの出力トークンの見込み
+    EXPECTED_OUTPUT_TOKENS = 1024
+
+    def __init__(self, api_key: str, quota: Optional[QuotaAccountant] = None):
+        # SDKの設定とモデルはプロセス全体で共有する
+        self.model = get_client_registry().gemini_model(api_key, 'gemini-pro')
+        self.quota = quota or get_quota_accountant()
 
-    def _is_chinese_text(self, text: str) -> bool:
-        """Validate if the text contains Chinese characters."""
-        return bool(re.search('[\u4e00-\u9fff]', text))
+    def _acquire_quota(self, prompt: str):
+        """Wait until a request for this prompt fits the Gemini RPM/TPM limits."""
+        self.quota.acquire_gemini(self._estimate_tokens(prompt) + self.EXPECTED_OUTPUT_TOKENS)
 
-    def generate_article(self, video_data: List[Dict], language: str = 'ja') -> str:
+    def _check_language(self, text: str, language: str, final: bool = False) -> Optional[bool]:
+        """Check whether generated text is in the target language.
+
+        Looks at the script ratio over the last DRIFT_WINDOW_LETTERS letters.
+        Returns False as soon as drift is clear, True once a full window is in
+        the target script, and None while there is not enough text to decide
+        (unless ``final`` is set, i.e. the output has ended).
+        """
+        pattern, threshold = self.LANGUAGE_SCRIPTS[language]
+        letters = re.findall(r'[^\W\d_]', text)[-self.DRIFT_WINDOW_LETTERS:]
+        if not letters:
+            return True if final else None
+        if len(letters) < self.DRIFT_MIN_LETTERS and not final:
+            return None
+
+        ratio = len(re.findall(pattern, ''.join(letters))) / len(letters)
+        if ratio < threshold:
+            return False
+        if len(letters) < self.DRIFT_WINDOW_LETTERS and not final:
+            return None
+        return True
+
+    def _generation_config(self, language: str):
+        """Return the generation config for the given output language."""
+        import google.generativeai as genai
+        if language == 'zh':
+            # Specific configuration for Chinese language generation
+            return genai.types.GenerationConfig(
+                temperature=0.9,  # Higher temperature for more natural Chinese
+                top_p=0.95,      # Higher diversity for Chinese expressions
+                top_k=40,
+                candidate_count=1,
+                stop_sequences=["English:", "Japanese:", "日本語:", "英語:"]
+            )
+        # Default configuration for other languages
+        return genai.types.GenerationConfig(
+            temperature=0.7,
+            top_p=0.8,
+            top_k=40,
+            candidate_count=1
+        )
+
+    def generate_article(self, video_data: List[Dict], language: str = 'ja',
+                         token_budget: Optional[int] = None) -> str:
         """Generate a summary from multiple video sources in specified language."""
-        prompt = self._prepare_prompt(video_data, language)
+        parts: List[str] = []
+        for chunk in self.generate_article_stream(video_data, language, token_budget):
+            if chunk is STREAM_RESET:
+                parts.clear()
+            else:
+                parts.append(chunk)
+        return ''.join(parts)
 
+    def _stream_text(self, prompt: str, language: str) -> Iterator[str]:
+        """Yield the text chunks of a streamed generate_content call."""
+        self._acquire_quota(prompt)
+        # 出力トークン数はチャンクごとの推定値の合計
+        output_tokens = 0
         try:
-            if language == 'zh':
-                # Specific configuration for Chinese language generation
-                generation_config = genai.types.GenerationConfig(
-                    temperature=0.9,  # Higher temperature for more natural Chinese
-                    top_p=0.95,      # Higher diversity for Chinese expressions
-                    top_k=40,
-                    candidate_count=1,
-                    stop_sequences=["English:", "Japanese:", "日本語:", "英語:"]
+            with span('generate_content', language=language):
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config(language),
+                    stream=True
                 )
+                for chunk in response:
+                    # セーフティフィルタ等でテキストを含まないチャンクは読み飛ばす
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    if text:
+                        output_tokens += self._estimate_tokens(text)
+                        yield text
+        finally:
+            incr('output_tokens_estimated', output_tokens)
+
+    def generate_article_stream(self, video_data: List[Dict], language: str = 'ja',
+                                token_budget: Optional[int] = None) -> Iterator[str]:
+        """Generate a summary like generate_article, yielding text chunks as they arrive.
+
+        Chunks are yielded as soon as they arrive while _check_language
+        watches the start of the output. If it drifts into another language,
+        the stream is abandoned, STREAM_RESET is yielded (consumers must
+        discard the text received so far) and generation is retried once
+        with a stricter language instruction.
+        """
+        with span('build_prompt', videos=len(video_data)):
+            prompt, prompt_tokens = self.build_prompt(video_data, language, token_budget)
+        incr('prompt_tokens_estimated', prompt_tokens)
+        prompts = [prompt, self.STRICT_LANGUAGE_PREFIXES[language] + prompt]
+
+        try:
+            for attempt, attempt_prompt in enumerate(prompts):
+                last_attempt = attempt == len(prompts) - 1
+                if attempt:
+                    incr('generation_retries')
+                # 最後の試行では判定せずにそのまま出力する
+                confirmed = last_attempt
+                head = ''
+                shown = False
+                drifted = False
+
+                for text in self._stream_text(attempt_prompt, language):
+                    if not confirmed:
+                        head += text
+                        verdict = self._check_language(head, language)
+                        if verdict is False:
+                            # 言語のずれが明らかになった時点でストリームを打ち切る
+                            drifted = True
+                            break
+                        confirmed = bool(verdict)
+                    shown = True
+                    yield text
+
+                # 判定ウィンドウより短い出力はストリーム終了時に判定する
+                if not drifted and (confirmed or self._check_language(head, language, final=True)):
+                    return
+                # 表示済みのテキストを破棄させてから生成し直す
+                if shown:
+                    yield STREAM_RESET
+
+        except Exception as e:
+            raise Exception(f"Gemini AI error: {str(e)}")
+
+    def _split_text(self, text: str, chunk_chars: int) -> List[str]:
+        """Split text into chunks of at most chunk_chars, preferring sentence ends."""
+        chunks = []
+        while len(text) > chunk_chars:
+            window = text[:chunk_chars]
+            cut = max(window.rfind(mark) for mark in ('。', '！', '？', '. ', '! ', '? ', '\n'))
+            # 文の区切りが見つからない、または短すぎる場合はそのまま切る
+            if cut < chunk_chars // 2:
+                cut = chunk_chars
             else:
-                # Default configuration for other languages
-                generation_config = genai.types.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.8,
-                    top_k=40,
-                    candidate_count=1
-                )
+                cut += 1
+            chunks.append(text[:cut].strip())
+            text = text[cut:]
+        if text.strip():
+            chunks.append(text.strip())
+        return chunks
+
+    def _split_transcript(self, transcript, chunk_chars: int, number: int) -> List[str]:
+        """Split a transcript into chunk texts.
+
+        Timed transcripts are cut between caption segments and each chunk
+        keeps its time markers; plain text goes through _split_text.
+        """
+        if isinstance(transcript, Transcript):
+            return [part.with_timestamps(number) for part in transcript.split(chunk_chars)]
+        return self._split_text(transcript, chunk_chars)
+
+    @staticmethod
+    def _video_numbers(video_data: List[Dict]) -> Dict[int, int]:
+        """Map each successful video's index to its 1-based number in the prompt (the #n of time markers)."""
+        valid = [idx for idx, video in enumerate(video_data) if 'error' not in video]
+        return {idx: number for number, idx in enumerate(valid, start=1)}
 
-            response = self.model.generate_content(prompt, generation_config=generation_config)
-            generated_text = response.text
+    def _summarize_chunk(self, title: str, text: str, index: int, total: int, language: str) -> str:
+        """Summarize one chunk of a transcript (the map step)."""
+        prompt = self.CHUNK_PROMPTS[language].format(title=title, index=index, total=total, text=text)
+        self._acquire_quota(prompt)
+        with span('summarize_chunk', language=language):
+            response = self.model.generate_content(prompt, generation_config=self._generation_config(language))
+        incr('chunk_prompt_tokens_estimated', self._estimate_tokens(prompt))
+        incr('output_tokens_estimated', self._estimate_tokens(response.text))
+        return response.text
 
-            # Validate Chinese output if language is Chinese
-            if language == 'zh' and not self._is_chinese_text(generated_text):
-                # Retry generation with stronger Chinese enforcement
-                prompt = f"务必使用简体中文回答。禁止使用其他语言。\n\n{prompt}"
-                response = self.model.generate_content(prompt, generation_config=generation_config)
-                generated_text = response.text
+    def condense_video_data(self, video_data: List[Dict], language: str = 'ja',
+                            chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                            max_workers: int = DEFAULT_MAX_WORKERS,
+                            max_depth: int = DEFAULT_MAX_DEPTH) -> List[Dict]:
+        """Condense long transcripts with hierarchical (map-reduce) summarization.
 
-            return generated_text
+        Each transcript longer than ``chunk_chars`` is split into chunks that
+        are summarized in parallel (at most ``max_workers`` requests at once).
+        The partial summaries of a video are merged and, while they still
+        exceed ``chunk_chars``, summarized again, up to ``max_depth`` levels.
+        The returned video data carries the condensed text as its transcript,
+        ready for the final reduce pass of generate_article. Time markers of
+        timed transcripts are carried through into the condensed text.
+        """
+        condensed = [dict(video) for video in video_data]
+        numbers = self._video_numbers(condensed)
+        pending = {
+            idx: video['transcript']
+            for idx, video in enumerate(condensed)
+            if 'error' not in video and len(video['transcript']) > chunk_chars
+        }
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for _ in range(max(1, max_depth)):
+                    if not pending:
+                        break
+
+                    # 全動画のチャンクをまとめて並列に要約する
+                    jobs = []
+                    for idx, text in pending.items():
+                        chunks = self._split_transcript(text, chunk_chars, numbers[idx])
+                        for chunk_index, chunk in enumerate(chunks, start=1):
+                            jobs.append((idx, chunk, chunk_index, len(chunks)))
+
+                    summaries = executor.map(
+                        in_context(lambda job: self._summarize_chunk(
+                            condensed[job[0]]['title'], job[1], job[2], job[3], language
+                        )),
+                        jobs
+                    )
+
+                    merged: Dict[int, List[str]] = {}
+                    for job, summary in zip(jobs, summaries):
+                        merged.setdefault(job[0], []).append(summary)
+
+                    pending = {}
+                    for idx, parts in merged.items():
+                        text = "\n\n".join(parts)
+                        condensed[idx]['transcript'] = text
+                        if len(text) > chunk_chars:
+                            pending[idx] = text
 
         except Exception as e:
             raise Exception(f"Gemini AI error: {str(e)}")
 
+        return condensed
+
+    def generate_article_hierarchical(self, video_data: List[Dict], language: str = 'ja',
+                                      chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                                      max_workers: int = DEFAULT_MAX_WORKERS,
+                                      max_depth: int = DEFAULT_MAX_DEPTH) -> str:
+        """Generate a summary of long videos via map-reduce summarization."""
+        condensed = self.condense_video_data(video_data, language, chunk_chars, max_workers, max_depth)
+        return self.generate_article(condensed, language)
+
     def _preprocess_chinese_text(self, text: str) -> str:
         """Preprocess Chinese text to handle encoding and segmentation properly."""
         # Remove extra whitespace between Chinese characters
@@ -59,8 +319,101 @@ class GeminiProcessor:
         text = text.replace('：', ':').replace('，', ',').replace('"', '"').replace('"', '"')
         return text
 
-    def _prepare_prompt(self, video_data: List[Dict], language: str) -> str:
-        """Prepare prompt for Gemini AI with language specification."""
+    def _estimate_tokens(self, text: str) -> int:
+        """Estimate the token count locally (about 1 token per CJK character, 4 other characters)."""
+        cjk = len(re.findall('[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]', text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def _allocate_token_budget(self, lengths: List[int], budget: int, minimum: int) -> List[int]:
+        """Split a token budget across transcripts in proportion to their length.
+
+        Every transcript is first guaranteed ``minimum`` tokens (or its full
+        length if shorter); only the budget left after those reservations is
+        split in proportion to the remaining length. Budget left over by
+        transcripts that fit completely is redistributed to the longer ones.
+        The allocations never add up to more than ``budget``.
+        """
+        if not lengths:
+            return []
+
+        minimum = min(minimum, budget // len(lengths)) if budget > 0 else 0
+        # 最低保証分を先に確保し、残りの予算だけを比例配分する
+        allocation = [min(length, minimum) for length in lengths]
+        needed = [length - reserved for length, reserved in zip(lengths, allocation)]
+        remaining = [i for i, need in enumerate(needed) if need > 0]
+        budget_left = max(budget, 0) - sum(allocation)
+
+        while remaining and budget_left > 0:
+            total = sum(needed[i] for i in remaining)
+            shares = {i: budget_left * needed[i] // total for i in remaining}
+            # 予算の割り当て分に収まる短い文字起こしは全文を採用し、残りを再配分する
+            fits = [i for i in remaining if needed[i] <= shares[i]]
+            if not fits:
+                for i in remaining:
+                    allocation[i] += shares[i]
+                break
+            for i in fits:
+                allocation[i] += needed[i]
+                budget_left -= needed[i]
+                remaining.remove(i)
+
+        return allocation
+
+    def _truncate_transcript(self, transcript: str, max_chars: int, language: str) -> str:
+        """Cut a transcript to max_chars, ending on a complete sentence where possible."""
+        if len(transcript) <= max_chars:
+            return transcript
+
+        transcript = transcript[:max_chars]
+        if language == 'zh':
+            # Find last complete Chinese sentence
+            last_period = max(
+                transcript.rfind('。'), 
+                transcript.rfind('！'), 
+                transcript.rfind('？'),
+                transcript.rfind('；')
+            )
+            if last_period > 0:
+                transcript = transcript[:last_period + 1]
+            return transcript
+        return transcript.rsplit('.', 1)[0] + '...'
+
+    def _transcript_tokens(self, transcript: Transcript, number: int) -> int:
+        """Estimate the tokens of a timed transcript including its time markers, without rendering it."""
+        markers = int(transcript.end - transcript.start) // DEFAULT_MARKER_INTERVAL + 1
+        marker_tokens = self._estimate_tokens(f"[#{number} {format_timestamp(transcript.end)}] ")
+        return self._estimate_tokens(str(transcript)) + markers * marker_tokens
+
+    def _fit_transcript(self, transcript: Transcript, tokens: int, allowed: int,
+                        number: int, language: str) -> str:
+        """Render a timed transcript with time markers within ``allowed`` tokens.
+
+        Trailing caption segments are dropped before rendering, so only the
+        part that goes into the prompt is copied.
+        """
+        if allowed < tokens:
+            transcript = transcript.truncate(len(transcript) * allowed // tokens)
+        while True:
+            text = transcript.with_timestamps(number)
+            if language == 'zh':
+                text = self._preprocess_chinese_text(text)
+            text_tokens = self._estimate_tokens(text)
+            if text_tokens <= allowed or not transcript.segment_count:
+                return text
+            # 見積もりより長くなった分（前処理による改行など）をさらに削る
+            transcript = transcript.truncate(len(transcript) * allowed // text_tokens)
+
+    def build_prompt(self, video_data: List[Dict], language: str,
+                     token_budget: Optional[int] = None) -> Tuple[str, int]:
+        """Build the prompt for Gemini AI within an input token budget.
+
+        The budget left after the instructions and titles is split across the
+        videos in proportion to their transcript length, with a per-video
+        minimum. Videos are numbered, and timed transcripts are rendered with
+        ``[#n m:ss]`` time markers the model is asked to cite. Returns the
+        prompt and its locally estimated token count.
+        """
+        token_budget = token_budget or self.DEFAULT_INPUT_TOKEN_BUDGET
         language_prompt = {
             'ja': """以下のYouTube動画に基づいて簡潔な要約を生成してください：
 
@@ -116,48 +469,66 @@ Generate all output in English.""",
 • 专业术语需使用标准中文译名"""
         }
 
+        videos = [video for video in video_data if 'error' not in video]
+        sources = [video['transcript'] for video in videos]
+        # 時刻マーカーがあれば出典の時刻を引用させる（階層要約後の文字起こしにもマーカーが残る）
+        timed = any(
+            isinstance(source, Transcript) or TIMESTAMP_MARKER.search(source)
+            for source in sources
+        )
+        citation = self.CITATION_INSTRUCTIONS[language] + "\n\n" if timed else ""
+
         # Prepare language-specific prompt
         if language == 'zh':
-            prompt = "【语言要求】\n必须使用标准简体中文输出全部内容。严禁使用其他语言。\n\n"
-            prompt += language_prompt[language] + "\n\n"
-            prompt += "【视频内容】\n"
+            header = "【语言要求】\n必须使用标准简体中文输出全部内容。严禁使用其他语言。\n\n"
+            header += language_prompt[language] + "\n\n"
+            header += citation
+            header += "【视频内容】\n"
+            footer = "\n【注意事项】\n请确保生成的摘要完全使用简体中文，并保持专业性和可读性的平衡。"
+            title_label = "【视频标题】"
+            content_label = "【内容记录】"
         else:
-            prompt = f"Output Language: {language}\n\n"
-            prompt += language_prompt[language] + "\n\n"
-
-        # Process video data
-        for video in video_data:
-            if 'error' not in video:
-                if language == 'zh':
-                    title_label = "【视频标题】"
-                    content_label = "【内容记录】"
-                else:
-                    title_label = "Title: "
-                    content_label = "Content: "
-
-                prompt += f"{title_label}{video['title']}\n"
-
-                # Preprocess transcript
-                transcript = video['transcript']
-                if language == 'zh':
-                    if len(transcript) > 2000:
-                        # Find last complete Chinese sentence
-                        transcript = transcript[:2000]
-                        last_period = max(
-                            transcript.rfind('。'), 
-                            transcript.rfind('！'), 
-                            transcript.rfind('？'),
-                            transcript.rfind('；')
-                        )
-                        if last_period > 0:
-                            transcript = transcript[:last_period + 1]
-                    transcript = self._preprocess_chinese_text(transcript)
-                else:
-                    transcript = transcript[:2000].rsplit('.', 1)[0] + '...'
-
-                prompt += f"{content_label}{transcript}\n\n"
+            header = f"Output Language: {language}\n\n"
+            header += language_prompt[language] + "\n\n"
+            header += citation
+            footer = ""
+            title_label = "Title: "
+            content_label = "Content: "
 
+        # 時刻付きの文字起こしは予算に収まる部分だけを後で書き出す（全文はコピーしない）
         if language == 'zh':
-            prompt += "\n【注意事项】\n请确保生成的摘要完全使用简体中文，并保持专业性和可读性的平衡。"
+            sources = [
+                source if isinstance(source, Transcript) else self._preprocess_chinese_text(source)
+                for source in sources
+            ]
+
+        # 指示文・タイトル等の固定部分を差し引いた残りを文字起こしに割り当てる
+        fixed_tokens = self._estimate_tokens(header + footer) + sum(
+            self._estimate_tokens(f"[#{number}] {title_label}{video['title']}\n{content_label}\n\n")
+            for number, video in enumerate(videos, start=1)
+        )
+        transcript_tokens = [
+            self._transcript_tokens(source, number) if isinstance(source, Transcript)
+            else self._estimate_tokens(source)
+            for number, source in enumerate(sources, start=1)
+        ]
+        allocation = self._allocate_token_budget(
+            transcript_tokens, token_budget - fixed_tokens, self.MIN_TOKENS_PER_VIDEO
+        )
+
+        prompt = header
+        for number, (video, transcript, tokens, allowed) in enumerate(
+                zip(videos, sources, transcript_tokens, allocation), start=1):
+            prompt += f"[#{number}] {title_label}{video['title']}\n"
+
+            if isinstance(transcript, Transcript):
+                transcript = self._fit_transcript(transcript, tokens, allowed, number, language)
+            elif allowed < tokens:
+                max_chars = len(transcript) * allowed // tokens
+                transcript = self._truncate_transcript(transcript, max_chars, language)
+
+            prompt += f"{content_label}{transcript}\n\n"
+
+        prompt += footer
 
-        return prompt
+        return prompt, self._estimate_tokens(prompt)
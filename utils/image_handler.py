@@ -1,49 +1,148 @@
-from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+import hashlib
+import json
+import os
+import threading
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageDraw
+
+# 描画済みの吹き出し画像の保存先（再起動後は Pillow を読み込まずに表示できる）
+BUBBLE_CACHE_DIR = Path('.cache/bubbles')
+
+@lru_cache(maxsize=8)
+def _load_font(font_path: Optional[str], size: int):
+    """フォントを読み込む（プロセス内で一度だけ）"""
+    from PIL import ImageFont
+    if font_path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(font_path, size=size)
+
+def _wrap_text(draw: 'ImageDraw.ImageDraw', text: str, font, max_width: int) -> List[str]:
+    """吹き出しの幅に収まるようにテキストを折り返す
+
+    空白を含む文章は単語単位、日本語など空白のない文章は文字単位で折り返す。
+    """
+    lines = []
+    for paragraph in text.split('\n'):
+        units = paragraph.split(' ') if ' ' in paragraph else list(paragraph)
+        separator = ' ' if ' ' in paragraph else ''
+        line = ''
+        for unit in units:
+            candidate = f"{line}{separator}{unit}" if line else unit
+            if line and draw.textlength(candidate, font=font) > max_width:
+                lines.append(line)
+                line = unit
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+@lru_cache(maxsize=64)
+def _render_character_bubble(text: str, character_path: str, character_mtime: float,
+                             font_path: Optional[str], font_size: int) -> bytes:
+    """キャラクターと吹き出しの画像を描画し、PNGのバイト列で返す
+
+    引数（テキスト・画像のパスと更新時刻・フォント）をキーにメモリとディスクに
+    キャッシュされるため、同じ吹き出しは再描画されない。
+    """
+    key = hashlib.sha256(json.dumps(
+        [text, character_path, character_mtime, font_path, font_size]
+    ).encode('utf-8')).hexdigest()
+    cache_path = BUBBLE_CACHE_DIR / f"{key}.png"
+    try:
+        return cache_path.read_bytes()
+    except OSError:
+        pass
+
+    data = _draw_character_bubble(text, character_path, font_path, font_size)
+    try:
+        BUBBLE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return data
+
+def _draw_character_bubble(text: str, character_path: str,
+                           font_path: Optional[str], font_size: int) -> bytes:
+    """キャラクターと吹き出しの画像を Pillow で描画する"""
+    from PIL import Image, ImageDraw
+    font = _load_font(font_path, font_size)
+
+    # キャラクター画像を開く
+    try:
+        base_img = Image.open(character_path)
+    except FileNotFoundError:
+        # キャラクター画像がない場合は白い画像を作成
+        base_img = Image.new('RGB', (400, 300), 'white')
+
+    # 描画オブジェクトを作成
+    draw = ImageDraw.Draw(base_img)
+
+    # 吹き出しの位置とサイズ
+    bubble_x = 150
+    bubble_y = 50
+    bubble_width = 200
+    bubble_padding = 10
+
+    # 長いテキストは折り返し、行数に合わせて吹き出しの高さを広げる
+    lines = _wrap_text(draw, text, font, bubble_width - bubble_padding * 2)
+    line_boxes = [draw.textbbox((0, 0), line, font=font) for line in lines]
+    line_height = max(box[3] - box[1] for box in line_boxes) + 4
+    text_height = line_height * len(lines)
+    bubble_height = max(100, text_height + bubble_padding * 2)
+
+    # 吹き出しを描画
+    draw.rectangle(
+        [(bubble_x, bubble_y), (bubble_x + bubble_width, bubble_y + bubble_height)],
+        fill='white',
+        outline='black',
+        width=2
+    )
+
+    # テキストを描画（中央揃え）
+    text_y = bubble_y + (bubble_height - text_height) // 2
+    for line, box in zip(lines, line_boxes):
+        text_width = box[2] - box[0]
+        text_x = bubble_x + (bubble_width - text_width) // 2
+        draw.text((text_x, text_y), line, fill='black', font=font)
+        text_y += line_height
+
+    buffer = BytesIO()
+    base_img.save(buffer, format='PNG')
+    return buffer.getvalue()
 
 class ImageHandler:
+    FONT_SIZE = 24
+
     def __init__(self):
         self.assets_dir = Path('assets')
         self.character_path = self.assets_dir / 'character.png'
-        
+
         # フォントの設定（日本語対応フォントが必要）
         font_path = self.assets_dir / 'fonts' / 'NotoSansJP-Regular.ttf'
-        self.font = ImageFont.truetype(str(font_path), size=24) if font_path.exists() else ImageFont.load_default()
+        self.font_path = str(font_path) if font_path.exists() else None
 
-    def create_character_bubble(self, text: str) -> Image.Image:
-        """キャラクターと吹き出しを含む画像を生成"""
-        # キャラクター画像を開く
+    @property
+    def font(self):
+        return _load_font(self.font_path, self.FONT_SIZE)
+
+    def render_character_bubble(self, text: str) -> bytes:
+        """キャラクターと吹き出しを含む画像をPNGのバイト列で返す（キャッシュ済み）"""
         try:
-            base_img = Image.open(self.character_path)
+            mtime = self.character_path.stat().st_mtime
         except FileNotFoundError:
-            # キャラクター画像がない場合は白い画像を作成
-            base_img = Image.new('RGB', (400, 300), 'white')
-
-        # 描画オブジェクトを作成
-        draw = ImageDraw.Draw(base_img)
-
-        # 吹き出しの位置とサイズ
-        bubble_x = 150
-        bubble_y = 50
-        bubble_width = 200
-        bubble_height = 100
-
-        # 吹き出しを描画
-        draw.rectangle(
-            [(bubble_x, bubble_y), (bubble_x + bubble_width, bubble_y + bubble_height)],
-            fill='white',
-            outline='black',
-            width=2
-        )
-
-        # テキストを描画（中央揃え）
-        text_bbox = draw.textbbox((0, 0), text, font=self.font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        text_x = bubble_x + (bubble_width - text_width) // 2
-        text_y = bubble_y + (bubble_height - text_height) // 2
-        
-        draw.text((text_x, text_y), text, fill='black', font=self.font)
+            mtime = 0.0
+        return _render_character_bubble(text, str(self.character_path), mtime,
+                                        self.font_path, self.FONT_SIZE)
 
-        return base_img 
\ No newline at end of file
+    def create_character_bubble(self, text: str) -> 'Image.Image':
+        """キャラクターと吹き出しを含む画像を生成"""
+        from PIL import Image
+        return Image.open(BytesIO(self.render_character_bubble(text)))
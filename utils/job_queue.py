@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+class JobStore:
+    """SQLite-backed store for job status, progress and results.
+
+    Kept on disk so job state survives Streamlit reruns and closed tabs,
+    and is visible to every session of the process.
+    """
+
+    DEFAULT_PATH = '.cache/jobs.sqlite3'
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.environ.get('JOB_STORE_PATH', self.DEFAULT_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    params TEXT,
+                    partial_text TEXT,
+                    result TEXT,
+                    error TEXT,
+                    owner_pid INTEGER,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )'''
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, params: Dict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, params, owner_pid, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', json.dumps(params, ensure_ascii=False), os.getpid(), now, now)
+            )
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False)
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{column} = ?" for column in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def fail_orphans(self):
+        """Mark unfinished jobs whose owning process has exited as failed."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+        for row in rows:
+            if row['owner_pid'] != os.getpid() and not _pid_alive(row['owner_pid']):
+                self.update(row['id'], status='failed', error='Worker process exited')
+
+    def purge(self, older_than: float):
+        """Delete finished jobs last updated more than ``older_than`` seconds ago."""
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - older_than,)
+            )
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobContext:
+    """Handle passed to a running job to report its progress."""
+
+    # 途中経過のテキストを書き込む最短間隔（秒）
+    PARTIAL_TEXT_INTERVAL = 0.3
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._last_partial_write = 0.0
+
+    def update(self, stage: str, progress: float):
+        """Record the stage the job is in and its progress (0.0 - 1.0)."""
+        self.store.update(self.job_id, stage=stage, progress=progress)
+
+    def set_partial_text(self, text: Union[str, Callable[[], str]], force: bool = False):
+        """Publish text generated so far; writes are throttled unless ``force`` is set.
+
+        ``text`` may be a callable, which is only called when the text is
+        actually written, so skipped updates cost nothing to render.
+        """
+        now = time.monotonic()
+        if force or now - self._last_partial_write >= self.PARTIAL_TEXT_INTERVAL:
+            self.store.update(self.job_id, partial_text=text() if callable(text) else text)
+            self._last_partial_write = now
+
+class JobManager:
+    """Runs jobs on a worker pool and tracks them in a JobStore.
+
+    submit() returns a job ID immediately. The UI polls get() for status,
+    progress, partial output and the result. Finished jobs are kept for
+    JOB_RETENTION_SECONDS.
+    """
+
+    DEFAULT_MAX_WORKERS = 4
+    JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+    def __init__(self, store: Optional[JobStore] = None, max_workers: Optional[int] = None):
+        self.store = store or JobStore()
+        self.max_workers = max_workers or int(os.environ.get('JOB_WORKERS', self.DEFAULT_MAX_WORKERS))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job-worker')
+        self.store.fail_orphans()
+
+    def submit(self, func: Callable, **params) -> str:
+        """Queue ``func(JobContext, **params)`` and return the job ID.
+
+        ``params`` must be JSON-serializable; the function's return value
+        is stored as the job result.
+        """
+        self.store.purge(self.JOB_RETENTION_SECONDS)
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, params)
+        self._executor.submit(self._run, job_id, func, params)
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, params: Dict):
+        self.store.update(job_id, status='running')
+        try:
+            result = func(JobContext(self.store, job_id), **params)
+            self.store.update(job_id, status='done', progress=1.0, result=result)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.update(job_id, status='failed', error=str(e))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job's status, stage, progress, partial_text, result and error."""
+        return self.store.get(job_id)
+
+_shared_job_manager: Optional[JobManager] = None
+_shared_job_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _shared_job_manager
+    with _shared_job_manager_lock:
+        if _shared_job_manager is None:
+            _shared_job_manager = JobManager()
+        return _shared_job_manager
@@ -0,0 +1,285 @@
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger('metrics')
+
+# ステージ所要時間のヒストグラムの境界（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = 'youtube_summary'
+
+class RequestMetrics:
+    """Spans and counters recorded while handling one request (one summarize job)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.request_id = uuid.uuid4().hex[:12]
+        self.started_at = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Dict] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, duration: float, attrs: Dict):
+        with self._lock:
+            self.spans.append({'stage': stage, 'duration': duration, **attrs})
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        """Return the call count and total seconds of each stage, in first-seen order."""
+        totals: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for span_record in self.spans:
+                total = totals.setdefault(span_record['stage'], {'count': 0, 'seconds': 0.0})
+                total['count'] += 1
+                total['seconds'] += span_record['duration']
+        return totals
+
+    def as_dict(self) -> Dict:
+        """Return a JSON-serializable summary of the request."""
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'request_id': self.request_id,
+            'name': self.name,
+            'duration': self.duration,
+            'stages': self.stage_totals(),
+            'counters': counters
+        }
+
+class MetricsRegistry:
+    """Process-wide stage duration histograms and event counters."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        # stage -> [各境界以下の件数..., 合計秒数, 件数, エラー件数]
+        self._histograms: Dict[str, List[float]] = {}
+        self._counters: Dict[str, float] = {}
+        self._gauge_callbacks: List[Callable[[], Dict[str, float]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration: float, error: bool = False):
+        with self._lock:
+            histogram = self._histograms.setdefault(stage, [0] * (len(self.buckets) + 3))
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-3] += duration
+            histogram[-2] += 1
+            if error:
+                histogram[-1] += 1
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def register_gauges(self, callback: Callable[[], Dict[str, float]]):
+        """Export the values returned by ``callback`` as gauges, read on every render."""
+        with self._lock:
+            self._gauge_callbacks.append(callback)
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        duration = f"{METRIC_PREFIX}_stage_duration_seconds"
+        errors = f"{METRIC_PREFIX}_stage_errors_total"
+        events = f"{METRIC_PREFIX}_events_total"
+        gauge = f"{METRIC_PREFIX}_quota"
+        lines = [
+            f"# HELP {duration} Time spent in each pipeline stage.",
+            f"# TYPE {duration} histogram"
+        ]
+        with self._lock:
+            histograms = {stage: list(values) for stage, values in self._histograms.items()}
+            counters = dict(self._counters)
+            gauge_callbacks = list(self._gauge_callbacks)
+
+        for stage, values in sorted(histograms.items()):
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{duration}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{duration}_bucket{{stage="{stage}",le="+Inf"}} {values[-2]}')
+            lines.append(f'{duration}_sum{{stage="{stage}"}} {values[-3]}')
+            lines.append(f'{duration}_count{{stage="{stage}"}} {values[-2]}')
+
+        lines += [f"# HELP {errors} Pipeline stages that raised an exception.", f"# TYPE {errors} counter"]
+        for stage, values in sorted(histograms.items()):
+            lines.append(f'{errors}{{stage="{stage}"}} {values[-1]}')
+
+        lines += [f"# HELP {events} Tokens, transcript characters, cache hits and retries.",
+                  f"# TYPE {events} counter"]
+        for name, value in sorted(counters.items()):
+            lines.append(f'{events}{{name="{name}"}} {value}')
+
+        # コールバックは SQLite を読むことがあるため、ロックの外で呼ぶ
+        gauges: Dict[str, float] = {}
+        for callback in gauge_callbacks:
+            try:
+                gauges.update(callback())
+            except Exception as e:
+                logger.warning("Could not read gauges: %s", e)
+        lines += [f"# HELP {gauge} Remaining rate limit and quota capacity, and usage by this process.",
+                  f"# TYPE {gauge} gauge"]
+        for name, value in sorted(gauges.items()):
+            lines.append(f'{gauge}{{name="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Atomically write the metrics to a file (for the node_exporter textfile collector)."""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.render_prometheus(), encoding='utf-8')
+        os.replace(tmp, target)
+
+_registry = MetricsRegistry()
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar('current_request', default=None)
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return _registry
+
+def current_request() -> Optional[RequestMetrics]:
+    """Return the metrics of the request being handled in this context, if any."""
+    return _current_request.get()
+
+def incr(name: str, value: float = 1):
+    """Add to a counter of the current request and the process-wide total."""
+    _registry.incr(name, value)
+    request = _current_request.get()
+    if request is not None:
+        request.incr(name, value)
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[None]:
+    """Time a pipeline stage and record it in the registry, the current request and the log."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _registry.observe(stage, duration, error is not None)
+        request = _current_request.get()
+        if request is not None:
+            request.add_span(stage, duration, attrs)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'event': 'span',
+                'request_id': request.request_id if request else None,
+                'stage': stage,
+                'duration_ms': round(duration * 1000, 2),
+                'error': error,
+                **attrs
+            }, ensure_ascii=False))
+
+@contextmanager
+def track_request(name: str) -> Iterator[RequestMetrics]:
+    """Collect the spans and counters recorded until the block exits.
+
+    On exit a summary is logged and, if METRICS_TEXTFILE is set, the
+    process-wide metrics are written to that file.
+    """
+    request = RequestMetrics(name)
+    token = _current_request.set(request)
+    try:
+        yield request
+    finally:
+        _current_request.reset(token)
+        request.duration = time.perf_counter() - request.started_at
+        _registry.observe(name, request.duration)
+        logger.info(json.dumps({'event': 'request', **request.as_dict()}, ensure_ascii=False))
+
+        textfile = os.environ.get('METRICS_TEXTFILE')
+        if textfile:
+            try:
+                _registry.write_textfile(textfile)
+            except OSError as e:
+                logger.warning("Could not write metrics textfile %s: %s", textfile, e)
+
+def in_context(func: Callable) -> Callable:
+    """Wrap ``func`` to run in a copy of the caller's context.
+
+    Worker threads do not inherit context variables, so pass callables
+    submitted to a thread pool through this to keep their spans and
+    counters attached to the current request.
+    """
+    context = copy_context()
+
+    def run(*args, **kwargs):
+        # Context は同時に複数のスレッドで実行できないため、呼び出しごとに複製する
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = _registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[int]:
+    """Serve /metrics on ``port`` (default: METRICS_PORT) once per process.
+
+    Returns the port being served, or None if no port is configured.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+        port = port if port is not None else int(os.environ.get('METRICS_PORT', 0)) or None
+        if port is None:
+            return None
+        try:
+            _server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsRequestHandler)
+        except OSError as e:
+            # 同じホストの別プロセスが既に提供している
+            logger.warning("Could not start metrics server on port %s: %s", port, e)
+            return None
+        threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+        return port
+
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+def configure_logging(level: Optional[str] = None):
+    """Send the structured span and request logs to stderr (default level: METRICS_LOG_LEVEL or INFO).
+
+    For hosts that do not configure logging themselves, like the Streamlit
+    app; safe to call on every script run.
+    """
+    global _logging_configured
+    with _logging_lock:
+        if _logging_configured:
+            return
+        handler = logging.StreamHandler()
+        # 1行1件の JSON として出力する
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel((level or os.environ.get('METRICS_LOG_LEVEL', 'INFO')).upper())
+        # ルートロガーの設定による二重出力を防ぐ
+        logger.propagate = False
+        _logging_configured = True
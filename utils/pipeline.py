@@ -0,0 +1,138 @@
+from typing import Dict, List
+import os
+from .youtube_handler import YouTubeHandler
+from .gemini_processor import GeminiProcessor, STREAM_RESET
+from .db_handler import get_database_handler, compute_source_hash
+from .job_queue import JobContext
+from .metrics import incr, span, track_request
+from .transcript import link_timestamps
+
+def run_summary_job(job: JobContext, urls: List[str], language: str,
+                    force_regenerate: bool = False, hierarchical: bool = False) -> Dict:
+    """Summarize videos as a background job: fetch, generate, save and load channel videos.
+
+    Stage names reported through ``job`` are the UI translation keys of the
+    stage. Returns a JSON-serializable result with the article, per-URL
+    errors, the canonical video URLs that were summarized (deduplicated, with
+    playlists expanded), the article with its ``[#n m:ss]`` citations linked
+    to that moment of the video, whether it came from the summary cache,
+    whether it was queued to be saved (the write itself finishes in the
+    background), the channel videos, and the per-stage timings and counters
+    of the run under ``metrics``.
+    """
+    with track_request('summarize') as metrics:
+        result = _summarize(job, urls, language, force_regenerate, hierarchical)
+    result['metrics'] = metrics.as_dict()
+    return result
+
+def _summarize(job: JobContext, urls: List[str], language: str,
+               force_regenerate: bool, hierarchical: bool) -> Dict:
+    result = {
+        'urls': [],
+        'article': None,
+        'cached': False,
+        'save_queued': False,
+        'errors': [],
+        'channel_videos': [],
+        'channel_error': None
+    }
+    # 階層要約は出力が異なるため、キャッシュキーのバージョンを分ける
+    prompt_version = GeminiProcessor.PROMPT_VERSION + ('-hierarchical' if hierarchical else '')
+
+    # Initialize handlers with environment variables
+    youtube_handler = YouTubeHandler(api_key=os.environ['YOUTUBE_API_KEY'])
+    db_handler = get_database_handler()
+
+    # URLを正規化して重複を除き、プレイリストを動画に展開する
+    job.update('resolving_urls', 0.05)
+    urls, result['errors'] = youtube_handler.resolve_urls(urls)
+    result['urls'] = urls
+    if not urls:
+        return result
+
+    # 保存済みの要約があればAIを呼ばずに再利用する
+    requested_ids = [youtube_handler.extract_video_id(url) for url in urls]
+    if not force_regenerate:
+        with span('summary_cache_lookup'):
+            cached = db_handler.get_summary_by_hash(
+                compute_source_hash(requested_ids, language, prompt_version)
+            )
+        incr('summary_cache_hits' if cached else 'summary_cache_misses')
+        if cached:
+            result['article'] = cached.summary
+            result['cached'] = True
+            _load_channel_videos(job, youtube_handler, urls[0], result)
+            return result
+
+    # Process videos
+    job.update('processing_videos', 0.1)
+    with span('process_videos', videos=len(urls)):
+        video_data = youtube_handler.process_videos(urls)
+
+    # Check for errors
+    video_errors = [{'url': data['url'], 'error': data['error']}
+                    for data in video_data if 'error' in data]
+    result['errors'] += video_errors
+    if len(video_errors) == len(video_data):
+        return result
+
+    gemini_processor = GeminiProcessor(api_key=os.environ['GEMINI_API_KEY'])
+    # プロンプト中の動画番号（#n）の順に並べた動画ID
+    video_ids = [data['video_id'] for data in video_data if 'error' not in data]
+
+    # 長時間動画モードでは文字起こしを先に分割要約しておく
+    if hierarchical:
+        job.update('condensing_transcripts', 0.3)
+        with span('condense_transcripts'):
+            video_data = gemini_processor.condense_video_data(video_data, language=language)
+
+    # Generate article (生成中のテキストを逐次公開する)
+    job.update('generating_article', 0.5)
+    chunks: List[str] = []
+    with span('generate_article'):
+        for chunk in gemini_processor.generate_article_stream(video_data, language=language):
+            # 出力言語がずれて生成し直す場合は、表示済みのテキストを破棄する
+            if chunk is STREAM_RESET:
+                chunks.clear()
+            else:
+                chunks.append(chunk)
+            # 連結とリンク付けは実際に書き込むときだけ行う
+            job.set_partial_text(lambda: link_timestamps(''.join(chunks), video_ids),
+                                 force=chunk is STREAM_RESET)
+    # 引用された時刻マーカーを動画のその位置へのリンクにする
+    article = link_timestamps(''.join(chunks), video_ids)
+    job.set_partial_text(article, force=True)
+    result['article'] = article
+
+    # Save to database (バックグラウンドでまとめて書き込む)
+    job.update('saving_summary', 0.8)
+    if len(video_data) > 0 and 'error' not in video_data[0]:
+        # 実際に要約に使われた動画のみでキャッシュキーを作成する
+        source_hash = compute_source_hash(
+            video_ids,
+            language,
+            prompt_version
+        )
+        with span('queue_summary_save'):
+            db_handler.save_summary_async(
+                video_id=youtube_handler.extract_video_id(urls[0]),
+                title=video_data[0]['title'],
+                summary=article,
+                language=language,
+                source_urls=','.join(urls),
+                thumbnail_url=video_data[0].get('thumbnail'),  # サムネイル情報を保存
+                source_hash=source_hash
+            )
+        result['save_queued'] = True
+
+    # Get channel videos
+    _load_channel_videos(job, youtube_handler, urls[0], result)
+    return result
+
+def _load_channel_videos(job: JobContext, youtube_handler: YouTubeHandler, url: str, result: Dict):
+    """Load the latest videos from the channel of the given video into the result."""
+    job.update('loading_channel_videos', 0.9)
+    try:
+        result['channel_videos'] = youtube_handler.get_channel_latest_videos(url)
+    except Exception as e:
+        result['channel_error'] = str(e)
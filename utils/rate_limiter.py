@@ -0,0 +1,314 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+import os
+import sqlite3
+import threading
+import time
+from .metrics import get_metrics_registry
+
+# YouTube Data API の各エンドポイントのクォータ消費量（ユニット）
+YOUTUBE_UNIT_COSTS = {
+    'videos.list': 1,
+    'channels.list': 1,
+    'playlistItems.list': 1,
+    'search.list': 100
+}
+# YouTube Data API の日次クォータは太平洋時間の0時にリセットされる
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+class QuotaExceededError(Exception):
+    """Raised when a call would exceed the daily quota of the current quota day."""
+
+def quota_day(now: Optional[float] = None) -> str:
+    """Return the current quota day (the date in Pacific time) as YYYY-MM-DD."""
+    return datetime.fromtimestamp(time.time() if now is None else now, QUOTA_TIMEZONE).date().isoformat()
+
+def next_quota_reset(now: Optional[float] = None) -> datetime:
+    """Return when the next quota day starts (midnight Pacific time)."""
+    current = datetime.fromtimestamp(time.time() if now is None else now, QUOTA_TIMEZONE)
+    tomorrow = current.date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=QUOTA_TIMEZONE)
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Holds up to ``capacity`` tokens and refills at ``rate`` tokens per
+    second. acquire() blocks until enough tokens are available, so callers
+    queue instead of failing.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: float) -> float:
+        """Take tokens if available; otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """Block until ``tokens`` are taken. Returns False if ``timeout`` expires first."""
+        tokens = min(tokens, self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def remaining(self) -> float:
+        """Return the tokens currently available."""
+        with self._lock:
+            elapsed = time.monotonic() - self._updated_at
+            return min(self.capacity, self._tokens + elapsed * self.rate)
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a SQLite file, shared by all processes on the host."""
+
+    def __init__(self, name: str, rate: float, capacity: float, path: str):
+        super().__init__(name, rate, capacity)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS token_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )'''
+            )
+            conn.execute(
+                'INSERT OR IGNORE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                (name, capacity, time.time())
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _refilled(self, conn: sqlite3.Connection, now: float) -> float:
+        tokens, updated_at = conn.execute(
+            'SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (self.name,)
+        ).fetchone()
+        # プロセス間で比較するため壁時計を使う（時計が戻った場合は補充しない）
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+
+    def _try_acquire(self, tokens: float) -> float:
+        with self._connect() as conn:
+            # 他のプロセスと同時に更新しないよう書き込みロックを取る
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                available = self._refilled(conn, now)
+                wait = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+                conn.execute(
+                    'UPDATE token_buckets SET tokens = ?, updated_at = ? WHERE name = ?',
+                    (available, now, self.name)
+                )
+                conn.execute('COMMIT')
+                return wait
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def remaining(self) -> float:
+        with self._connect() as conn:
+            return self._refilled(conn, time.time())
+
+class DailyQuota:
+    """Fixed-window counter of the units used in the current quota day.
+
+    Unlike a token bucket, the allowance does not refill during the day:
+    at most ``limit`` units can be charged between two Pacific-time
+    midnights, matching how the YouTube Data API counts its quota.
+    """
+
+    def __init__(self, name: str, limit: float):
+        self.name = name
+        self.limit = limit
+        self._day: Optional[str] = None
+        self._used = 0.0
+        self._lock = threading.Lock()
+
+    def _try_charge(self, units: float) -> bool:
+        with self._lock:
+            day = quota_day()
+            if day != self._day:
+                self._day, self._used = day, 0.0
+            if self._used + units > self.limit:
+                return False
+            self._used += units
+            return True
+
+    def charge(self, units: float):
+        """Charge ``units`` to today's quota; raises QuotaExceededError if they do not fit."""
+        if not self._try_charge(units):
+            raise QuotaExceededError(
+                f"Daily quota of {self.limit:g} units for {self.name} is used up "
+                f"until {next_quota_reset().isoformat()}"
+            )
+
+    def used(self) -> float:
+        """Return the units charged in the current quota day."""
+        with self._lock:
+            return self._used if self._day == quota_day() else 0.0
+
+    def remaining(self) -> float:
+        return max(0.0, self.limit - self.used())
+
+class SQLiteDailyQuota(DailyQuota):
+    """Daily quota counter kept in a SQLite file, shared by all processes on the host."""
+
+    def __init__(self, name: str, limit: float, path: str):
+        super().__init__(name, limit)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS daily_quotas (
+                    name TEXT PRIMARY KEY,
+                    day TEXT NOT NULL,
+                    used REAL NOT NULL
+                )'''
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _try_charge(self, units: float) -> bool:
+        with self._connect() as conn:
+            # 他のプロセスと同時に更新しないよう書き込みロックを取る
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                day = quota_day()
+                row = conn.execute('SELECT day, used FROM daily_quotas WHERE name = ?', (self.name,)).fetchone()
+                used = row[1] if row and row[0] == day else 0.0
+                charged = used + units <= self.limit
+                if charged:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO daily_quotas (name, day, used) VALUES (?, ?, ?)',
+                        (self.name, day, used + units)
+                    )
+                conn.execute('COMMIT')
+                return charged
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def used(self) -> float:
+        with self._connect() as conn:
+            row = conn.execute('SELECT day, used FROM daily_quotas WHERE name = ?', (self.name,)).fetchone()
+        return row[1] if row and row[0] == quota_day() else 0.0
+
+class QuotaAccountant:
+    """Rate limits and quota tracking for the YouTube Data API and Gemini.
+
+    YouTube calls are charged their endpoint unit cost against the daily
+    quota, a fixed window that resets at midnight Pacific time like the API's
+    own (calls beyond it raise QuotaExceededError instead of waiting for
+    hours), and smoothed by a token bucket of requests per second. Gemini
+    calls are limited by requests and tokens per minute. Limits come from
+    environment variables. If RATE_LIMIT_DB is set, the buckets and the
+    daily counter are kept in that SQLite file and shared by every process
+    on the host.
+    """
+
+    def __init__(self, backend_path: Optional[str] = None):
+        backend_path = backend_path or os.environ.get('RATE_LIMIT_DB')
+
+        def bucket(name: str, rate: float, capacity: float) -> TokenBucket:
+            if backend_path:
+                return SQLiteTokenBucket(name, rate, capacity, backend_path)
+            return TokenBucket(name, rate, capacity)
+
+        daily_units = float(os.environ.get('YOUTUBE_DAILY_QUOTA', 10000))
+        youtube_qps = float(os.environ.get('YOUTUBE_QPS', 10))
+        gemini_rpm = float(os.environ.get('GEMINI_RPM', 60))
+        gemini_tpm = float(os.environ.get('GEMINI_TPM', 1000000))
+
+        self.youtube_units = (SQLiteDailyQuota('youtube_daily_units', daily_units, backend_path)
+                              if backend_path else DailyQuota('youtube_daily_units', daily_units))
+        self.youtube_requests = bucket('youtube_requests', youtube_qps, youtube_qps)
+        self.gemini_requests = bucket('gemini_requests', gemini_rpm / 60, gemini_rpm)
+        self.gemini_tokens = bucket('gemini_tokens', gemini_tpm / 60, gemini_tpm)
+
+        # このプロセスでの使用量
+        self.youtube_units_used = 0
+        self.gemini_requests_used = 0
+        self.gemini_tokens_used = 0
+        self._lock = threading.Lock()
+
+    def acquire_youtube(self, endpoint: str):
+        """Charge a YouTube Data API call to ``endpoint``, waiting for the request rate limit.
+
+        Raises QuotaExceededError if today's quota cannot cover its unit cost.
+        """
+        cost = YOUTUBE_UNIT_COSTS.get(endpoint, 1)
+        # 日次クォータを先に確認し、使い切っていれば待たずに失敗させる
+        self.youtube_units.charge(cost)
+        self.youtube_requests.acquire(1)
+        with self._lock:
+            self.youtube_units_used += cost
+
+    def acquire_gemini(self, tokens: int):
+        """Wait until a Gemini request of about ``tokens`` tokens fits the limits, then charge it."""
+        self.gemini_requests.acquire(1)
+        self.gemini_tokens.acquire(tokens)
+        with self._lock:
+            self.gemini_requests_used += 1
+            self.gemini_tokens_used += tokens
+
+    def gauges(self) -> Dict[str, float]:
+        """Return the remaining capacity of each limit and this process's usage."""
+        return {
+            'youtube_units_remaining': self.youtube_units.remaining(),
+            'youtube_requests_remaining': self.youtube_requests.remaining(),
+            'gemini_requests_remaining': self.gemini_requests.remaining(),
+            'gemini_tokens_remaining': self.gemini_tokens.remaining(),
+            'youtube_units_used': self.youtube_units_used,
+            'gemini_requests_used': self.gemini_requests_used,
+            'gemini_tokens_used': self.gemini_tokens_used
+        }
+
+_shared_accountant: Optional[QuotaAccountant] = None
+_shared_accountant_lock = threading.Lock()
+
+def get_quota_accountant() -> QuotaAccountant:
+    """Return the process-wide quota accountant."""
+    global _shared_accountant
+    with _shared_accountant_lock:
+        if _shared_accountant is None:
+            _shared_accountant = QuotaAccountant()
+            get_metrics_registry().register_gauges(_shared_accountant.gauges)
+        return _shared_accountant
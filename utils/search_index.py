@@ -0,0 +1,114 @@
+from datetime import datetime
+from collections import Counter
+from typing import Dict, Iterable, List, Set
+import re
+import threading
+
+# 日本語・中国語（かな・漢字・全角文字）は単語の区切りがないため bigram で索引する
+CJK_PATTERN = re.compile('[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uff66-\uff9f]+')
+WORD_PATTERN = re.compile(r'[0-9a-z]+')
+
+def term_counts(text: str, language: str) -> Counter:
+    """Split text into index terms and count them in a single pass.
+
+    English text is split into lower-cased words. For ja/zh, runs of CJK
+    characters are indexed as single characters and overlapping bigrams,
+    and any Latin words in them are indexed as words.
+    """
+    text = text.lower()
+    counts = Counter(WORD_PATTERN.findall(text))
+    if language in ('ja', 'zh'):
+        for run in CJK_PATTERN.findall(text):
+            counts.update(run)
+            counts.update(run[i:i + 2] for i in range(len(run) - 1))
+    return counts
+
+def tokenize(text: str, language: str) -> Set[str]:
+    """Split text into the set of its index terms (see term_counts)."""
+    return set(term_counts(text, language))
+
+def query_terms(query: str, language: str) -> Set[str]:
+    """Split a search query into the terms that must all match."""
+    query = query.lower()
+    terms = set(WORD_PATTERN.findall(query))
+    if language in ('ja', 'zh'):
+        for run in CJK_PATTERN.findall(query):
+            if len(run) == 1:
+                terms.add(run)
+            else:
+                terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+class SummarySearchIndex:
+    """In-memory inverted index over summaries.
+
+    Pure-Python fallback for backends without the search_summaries RPC from
+    db/migration.sql. Every query term must match (AND semantics); results
+    are ordered by term frequency, then by newest first.
+    """
+
+    def __init__(self, language: str):
+        self.language = language
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._timestamps: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: int, text: str, timestamp: datetime):
+        """Index (or re-index) a document."""
+        counts = term_counts(text, self.language)
+        with self._lock:
+            self._remove_locked(doc_id)
+            for term, count in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            self._doc_terms[doc_id] = set(counts)
+            self._timestamps[doc_id] = timestamp
+
+    def add_many(self, documents: Iterable[tuple]):
+        """Index (doc_id, text, timestamp) tuples."""
+        for doc_id, text, timestamp in documents:
+            self.add(doc_id, text, timestamp)
+
+    def remove(self, doc_id: int):
+        """Drop a document from the index."""
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: int):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._timestamps.pop(doc_id, None)
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """Return the IDs of documents matching every term of the query."""
+        terms = query_terms(query, self.language)
+        if not terms:
+            return []
+
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+
+            # 最も短い転置リストから順に積集合を取る
+            postings.sort(key=len)
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                matches &= posting.keys()
+                if not matches:
+                    return []
+
+            scored = [
+                (sum(posting[doc_id] for posting in postings), self._timestamps[doc_id], doc_id)
+                for doc_id in matches
+            ]
+
+        scored.sort(reverse=True)
+        return [doc_id for _, _, doc_id in scored[:limit]]
@@ -0,0 +1,235 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional
+import base64
+import hashlib
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+class ThumbnailCache:
+    """Local proxy cache for YouTube thumbnails.
+
+    Each thumbnail is downloaded once and stored content-addressed (by the
+    sha256 of its bytes) together with downscaled variants for the widths
+    we display. Only https URLs on YouTube's thumbnail hosts are fetched,
+    with a size cap. Files (including the URL map) are evicted least
+    recently used first once the cache directory exceeds ``max_bytes``.
+    URLs that failed are not retried for FAILURE_TTL_SECONDS, so a page
+    rerun does not wait for the same dead thumbnails again.
+    """
+
+    DEFAULT_DIR = '.cache/thumbnails'
+    DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+    DEFAULT_MAX_WORKERS = 8
+    # 表示サイズ（px）: 履歴のカードとチャンネル動画一覧（120px表示の2倍）
+    CARD_WIDTH = 360
+    LIST_WIDTH = 240
+    # thumbnail_url はユーザーが登録できるため、YouTube のサムネイル配信ホスト以外は取得しない
+    ALLOWED_HOST = 'ytimg.com'
+    # 1枚あたりのダウンロード上限（maxresdefault でも数百KB）
+    MAX_DOWNLOAD_BYTES = 5 * 1024 * 1024
+    # 取得に失敗したURLを再試行しない秒数
+    FAILURE_TTL_SECONDS = 60
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 timeout: float = 10):
+        self.cache_dir = Path(cache_dir or os.environ.get('THUMBNAIL_CACHE_DIR', self.DEFAULT_DIR))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get('THUMBNAIL_CACHE_MAX_BYTES', self.DEFAULT_MAX_BYTES))
+        self.timeout = timeout
+        self._objects_dir = self.cache_dir / 'objects'
+        self._urls_dir = self.cache_dir / 'urls'
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        self._urls_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._format: Optional[str] = None
+        # url -> 失敗した時刻
+        self._failures: Dict[str, float] = {}
+        self._failures_lock = threading.Lock()
+
+    @property
+    def format(self) -> str:
+        """Image format of the variants: WEBP, or JPEG if Pillow lacks WebP support."""
+        if self._format is None:
+            # Pillow は読み込みが重いため、最初に使うときに読み込む
+            from PIL import Image
+            Image.init()
+            self._format = 'WEBP' if 'WEBP' in Image.SAVE else 'JPEG'
+        return self._format
+
+    @property
+    def extension(self) -> str:
+        return 'webp' if self.format == 'WEBP' else 'jpg'
+
+    def get(self, url: str, width: int) -> Optional[bytes]:
+        """Return the thumbnail at ``url`` downscaled to ``width``, or None if it cannot be fetched."""
+        if self._recently_failed(url):
+            return None
+        try:
+            content_hash = self._content_hash(url)
+            variant_path = self._objects_dir / f"{content_hash}_{width}.{self.extension}"
+            if variant_path.exists():
+                os.utime(variant_path)
+                return variant_path.read_bytes()
+
+            original = (self._objects_dir / content_hash).read_bytes()
+            variant = self._resize(original, width)
+            self._write(variant_path, variant)
+            self._evict()
+            return variant
+        except Exception:
+            self._record_failure(url)
+            return None
+
+    def get_many(self, urls: List[str], width: int) -> Dict[str, bytes]:
+        """Fetch several thumbnails concurrently; missing ones are left out."""
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        if not unique_urls:
+            return {}
+        workers = min(self.DEFAULT_MAX_WORKERS, len(unique_urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda url: self.get(url, width), unique_urls)
+            return {url: data for url, data in zip(unique_urls, results) if data}
+
+    def data_uri(self, url: str, width: int) -> Optional[str]:
+        """Return the thumbnail as a data: URI for use in HTML, or None."""
+        data = self.get(url, width)
+        if data is None:
+            return None
+        return self._to_data_uri(data)
+
+    def data_uris(self, urls: List[str], width: int) -> Dict[str, str]:
+        """Like data_uri for several thumbnails, fetched concurrently; missing ones are left out."""
+        return {url: self._to_data_uri(data) for url, data in self.get_many(urls, width).items()}
+
+    def _to_data_uri(self, data: bytes) -> str:
+        mime = 'image/webp' if self.format == 'WEBP' else 'image/jpeg'
+        return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+    def _recently_failed(self, url: str) -> bool:
+        with self._failures_lock:
+            failed_at = self._failures.get(url)
+            return failed_at is not None and time.monotonic() - failed_at < self.FAILURE_TTL_SECONDS
+
+    def _record_failure(self, url: str):
+        now = time.monotonic()
+        with self._failures_lock:
+            # 期限切れの記録を捨てて、対応表が増え続けないようにする
+            self._failures = {failed_url: failed_at for failed_url, failed_at in self._failures.items()
+                              if now - failed_at < self.FAILURE_TTL_SECONDS}
+            self._failures[url] = now
+
+    def _content_hash(self, url: str) -> str:
+        """Resolve a URL to the hash of its content, downloading it on first use."""
+        if not self.is_allowed_url(url):
+            raise ValueError(f"Thumbnail URL not allowed: {url}")
+        url_path = self._urls_dir / hashlib.sha256(url.encode('utf-8')).hexdigest()
+        if url_path.exists():
+            content_hash = url_path.read_text().strip()
+            if (self._objects_dir / content_hash).exists():
+                os.utime(url_path)
+                return content_hash
+
+        data = self._download(url)
+        content_hash = hashlib.sha256(data).hexdigest()
+        original_path = self._objects_dir / content_hash
+        if not original_path.exists():
+            self._write(original_path, data)
+        self._write(url_path, content_hash.encode('ascii'))
+        return content_hash
+
+    @classmethod
+    def is_allowed_url(cls, url: str) -> bool:
+        """Whether ``url`` is an https URL on i.ytimg.com or another *.ytimg.com host."""
+        try:
+            parts = urlsplit(url)
+            port = parts.port
+        except ValueError:
+            return False
+        host = (parts.hostname or '').lower()
+        return (parts.scheme == 'https' and port in (None, 443) and not parts.username
+                and (host == cls.ALLOWED_HOST or host.endswith('.' + cls.ALLOWED_HOST)))
+
+    def _download(self, url: str) -> bytes:
+        """Download at most MAX_DOWNLOAD_BYTES, following redirects only to allowed URLs."""
+        opener = urllib.request.build_opener(_AllowedRedirectHandler(self.is_allowed_url))
+        with opener.open(url, timeout=self.timeout) as response:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"Thumbnail too large: {length} bytes")
+            data = response.read(self.MAX_DOWNLOAD_BYTES + 1)
+        if len(data) > self.MAX_DOWNLOAD_BYTES:
+            raise ValueError("Thumbnail too large")
+        return data
+
+    def _resize(self, data: bytes, width: int) -> bytes:
+        from PIL import Image
+        image = Image.open(BytesIO(data))
+        image = image.convert('RGB')
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format=self.format, quality=80)
+        return buffer.getvalue()
+
+    def _write(self, path: Path, data: bytes):
+        # 書き込み途中のファイルを読まないよう、一時ファイルに書いてから置き換える
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def _evict(self):
+        """Delete the least recently used objects and URL map entries while over the byte budget."""
+        with self._lock:
+            files = []
+            total = 0
+            for directory in (self._objects_dir, self._urls_dir):
+                for path in directory.iterdir():
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    # URL の対応表は小さなファイルが多いため、実際に使っているブロック数で数える
+                    size = max(stat.st_size, getattr(stat, 'st_blocks', 0) * 512)
+                    files.append((stat.st_mtime, size, path))
+                    total += size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+class _AllowedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Refuse redirects to URLs the thumbnail cache would not fetch directly."""
+
+    def __init__(self, is_allowed):
+        self.is_allowed = is_allowed
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not self.is_allowed(newurl):
+            raise urllib.error.HTTPError(newurl, code, f"Redirect not allowed: {newurl}", headers, fp)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+_shared_thumbnail_cache: Optional[ThumbnailCache] = None
+_shared_thumbnail_cache_lock = threading.Lock()
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return the process-wide thumbnail cache."""
+    global _shared_thumbnail_cache
+    with _shared_thumbnail_cache_lock:
+        if _shared_thumbnail_cache is None:
+            _shared_thumbnail_cache = ThumbnailCache()
+        return _shared_thumbnail_cache
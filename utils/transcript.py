@@ -0,0 +1,228 @@
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import json
+import re
+from .url_normalizer import canonical_video_url
+
+# 要約中で出典の時刻を示すマーカー: [#<動画番号> <m:ss または h:mm:ss>]
+TIMESTAMP_MARKER = re.compile(r'\[#(\d+) ((?:\d+:)?\d{1,2}:\d{2})\]')
+# with_timestamps の既定のマーカー間隔（秒）
+DEFAULT_MARKER_INTERVAL = 60
+
+class Segment(NamedTuple):
+    """One caption segment; times are in seconds."""
+    start: float
+    duration: float
+    text: str
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds as m:ss, or h:mm:ss from one hour on."""
+    total = int(seconds)
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+def parse_timestamp(value: str) -> int:
+    """Parse m:ss or h:mm:ss into seconds."""
+    seconds = 0
+    for part in value.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def timestamp_url(video_id: str, seconds: float) -> str:
+    """URL that opens the video at ``seconds``."""
+    return f"{canonical_video_url(video_id)}&t={int(seconds)}s"
+
+class Transcript:
+    """Caption text of a video with the timing of each segment.
+
+    The segments are joined once into a single string (separated by spaces,
+    exactly like the old flat transcript) and their start and duration are
+    kept in compact integer arrays in milliseconds next to the character
+    offset of each segment. Slicing by time or character budget returns a
+    view that shares the text and arrays; only str() of a partial view
+    copies the characters in its range.
+    """
+
+    __slots__ = ('video_id', '_text', '_offsets', '_starts', '_durations', '_lo', '_hi')
+
+    def __init__(self, video_id: str, text: str, offsets: array, starts: array, durations: array,
+                 lo: int = 0, hi: Optional[int] = None):
+        self.video_id = video_id
+        self._text = text
+        # _offsets[i] は i 番目のセグメントの開始位置。末尾に len(text) + 1 の番兵を持つ
+        self._offsets = offsets
+        self._starts = starts
+        self._durations = durations
+        self._lo = lo
+        self._hi = len(starts) if hi is None else hi
+
+    @classmethod
+    def from_segments(cls, video_id: str, segments: Iterable[Dict]) -> 'Transcript':
+        """Build a transcript from youtube_transcript_api entries (text, start, duration)."""
+        texts: List[str] = []
+        offsets = array('I')
+        starts = array('I')
+        durations = array('I')
+        position = 0
+        for entry in segments:
+            text = entry['text']
+            texts.append(text)
+            offsets.append(position)
+            starts.append(int(round(entry.get('start', 0) * 1000)))
+            durations.append(int(round(entry.get('duration', 0) * 1000)))
+            position += len(text) + 1
+        offsets.append(position)
+        return cls(video_id, ' '.join(texts), offsets, starts, durations)
+
+    def _view(self, lo: int, hi: int) -> 'Transcript':
+        return Transcript(self.video_id, self._text, self._offsets, self._starts, self._durations, lo, hi)
+
+    def _char_range(self, lo: int, hi: int) -> Tuple[int, int]:
+        if hi <= lo:
+            return 0, 0
+        return self._offsets[lo], self._offsets[hi] - 1
+
+    def __str__(self) -> str:
+        if self._lo == 0 and self._hi == len(self._starts):
+            return self._text
+        begin, end = self._char_range(self._lo, self._hi)
+        return self._text[begin:end]
+
+    def __len__(self) -> int:
+        begin, end = self._char_range(self._lo, self._hi)
+        return end - begin
+
+    def __iter__(self) -> Iterator[Segment]:
+        for i in range(self._lo, self._hi):
+            yield self._segment(i)
+
+    def __repr__(self) -> str:
+        return (f"Transcript(video_id={self.video_id!r}, segments={self._hi - self._lo}, "
+                f"start={format_timestamp(self.start)}, end={format_timestamp(self.end)})")
+
+    def _segment(self, i: int) -> Segment:
+        return Segment(
+            self._starts[i] / 1000,
+            self._durations[i] / 1000,
+            self._text[self._offsets[i]:self._offsets[i + 1] - 1]
+        )
+
+    @property
+    def segment_count(self) -> int:
+        return self._hi - self._lo
+
+    @property
+    def start(self) -> float:
+        """Start time of the first segment in seconds."""
+        return self._starts[self._lo] / 1000 if self._hi > self._lo else 0.0
+
+    @property
+    def end(self) -> float:
+        """End time of the last segment in seconds."""
+        if self._hi <= self._lo:
+            return 0.0
+        last = self._hi - 1
+        return (self._starts[last] + self._durations[last]) / 1000
+
+    def slice_time(self, start: float, end: Optional[float] = None) -> 'Transcript':
+        """Segments from the one playing at ``start`` up to (not including) ``end`` seconds."""
+        lo = max(self._lo, bisect_right(self._starts, int(start * 1000), self._lo, self._hi) - 1)
+        hi = self._hi if end is None else bisect_right(self._starts, int(end * 1000) - 1, lo, self._hi)
+        return self._view(lo, max(lo, hi))
+
+    def truncate(self, max_chars: int) -> 'Transcript':
+        """The longest leading run of whole segments that fits in ``max_chars``."""
+        if self._hi <= self._lo:
+            return self
+        limit = self._offsets[self._lo] + max(max_chars, 0) + 1
+        hi = bisect_right(self._offsets, limit, self._lo, self._hi + 1) - 1
+        return self._view(self._lo, max(self._lo, hi))
+
+    def split(self, max_chars: int) -> List['Transcript']:
+        """Split into consecutive views of at most ``max_chars`` (a longer single segment stays whole)."""
+        parts = []
+        rest = self
+        while rest.segment_count:
+            part = rest.truncate(max_chars)
+            if not part.segment_count:
+                part = rest._view(rest._lo, rest._lo + 1)
+            parts.append(part)
+            rest = rest._view(part._hi, rest._hi)
+        return parts
+
+    def time_at(self, char_position: int) -> float:
+        """Start time in seconds of the segment containing ``char_position`` of str(self)."""
+        if self._hi <= self._lo:
+            return 0.0
+        i = bisect_right(self._offsets, self._offsets[self._lo] + char_position, self._lo, self._hi) - 1
+        return self._starts[max(i, self._lo)] / 1000
+
+    def url_at(self, seconds: float) -> str:
+        return timestamp_url(self.video_id, seconds)
+
+    def with_timestamps(self, number: int, interval: int = DEFAULT_MARKER_INTERVAL) -> str:
+        """Render the text with a ``[#number m:ss]`` marker at the first segment of every ``interval`` seconds."""
+        if self._hi <= self._lo:
+            return ''
+        interval_ms = max(interval, 1) * 1000
+        parts = []
+        next_mark = -1
+        begin = self._offsets[self._lo]
+        for i in range(self._lo, self._hi):
+            start = self._starts[i]
+            if start < next_mark:
+                continue
+            # 前のマーカーからこのセグメントの手前までを1回のスライスで追加する
+            if i > self._lo:
+                parts.append(self._text[begin:self._offsets[i]])
+            parts.append(f"[#{number} {format_timestamp(start / 1000)}] ")
+            begin = self._offsets[i]
+            next_mark = (start // interval_ms + 1) * interval_ms
+        parts.append(self._text[begin:self._offsets[self._hi] - 1])
+        return ''.join(parts)
+
+    def to_json(self) -> str:
+        """Serialize for the transcript cache: segment lengths, start and duration in milliseconds."""
+        offsets = self._offsets[self._lo:self._hi + 1]
+        return json.dumps({
+            'video_id': self.video_id,
+            'text': str(self),
+            'lengths': [offsets[i + 1] - offsets[i] - 1 for i in range(len(offsets) - 1)],
+            'starts': self._starts[self._lo:self._hi].tolist(),
+            'durations': self._durations[self._lo:self._hi].tolist()
+        }, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data: str) -> 'Transcript':
+        """Inverse of to_json; raises ValueError for anything else."""
+        try:
+            payload = json.loads(data)
+            offsets = array('I', [0])
+            for length in payload['lengths']:
+                offsets.append(offsets[-1] + length + 1)
+            starts = array('I', payload['starts'])
+            durations = array('I', payload['durations'])
+            text = payload['text']
+        except (AttributeError, TypeError, KeyError, OverflowError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid transcript data: {e}")
+        if not (len(starts) == len(durations) == len(offsets) - 1 and offsets[-1] - 1 <= len(text)):
+            raise ValueError("Invalid transcript data: segment arrays do not match the text")
+        return cls(payload.get('video_id', ''), text, offsets, starts, durations)
+
+def link_timestamps(text: str, video_ids: List[str]) -> str:
+    """Turn ``[#n m:ss]`` citations into markdown links to that moment of the n-th video.
+
+    Markers naming an unknown video number are left as they are.
+    """
+    def replace(match: re.Match) -> str:
+        number = int(match.group(1))
+        if not 1 <= number <= len(video_ids):
+            return match.group(0)
+        label = match.group(2) if len(video_ids) == 1 else f"#{number} {match.group(2)}"
+        return f"[{label}]({timestamp_url(video_ids[number - 1], parse_timestamp(match.group(2)))})"
+
+    return TIMESTAMP_MARKER.sub(replace, text)
@@ -0,0 +1,117 @@
+from typing import Iterable, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+import re
+
+VIDEO_ID_PATTERN = re.compile(r'^[0-9A-Za-z_-]{11}$')
+PLAYLIST_ID_PATTERN = re.compile(r'^[0-9A-Za-z_-]{12,64}$')
+
+YOUTUBE_HOSTS = {
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+    'youtube-nocookie.com', 'www.youtube-nocookie.com'
+}
+SHORT_LINK_HOSTS = {'youtu.be', 'www.youtu.be'}
+# /<prefix>/<video_id> 形式のパス
+VIDEO_PATH_PREFIXES = {'shorts', 'embed', 'live', 'v', 'e'}
+
+class YouTubeLink(NamedTuple):
+    """A parsed YouTube URL: kind is 'video' or 'playlist'."""
+    kind: str
+    id: str
+
+    @property
+    def url(self) -> str:
+        """Canonical URL of the video or playlist."""
+        if self.kind == 'playlist':
+            return f"https://www.youtube.com/playlist?list={self.id}"
+        return canonical_video_url(self.id)
+
+def canonical_video_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def _valid_video_id(value: Optional[str]) -> Optional[str]:
+    return value if value and VIDEO_ID_PATTERN.match(value) else None
+
+def parse_youtube_url(url: str) -> Optional[YouTubeLink]:
+    """Parse any YouTube URL form into a video or playlist link.
+
+    Handles watch, youtu.be, shorts, embed, live and v/ URLs on www, m,
+    music and youtube-nocookie hosts, with or without a scheme, as well as
+    playlist URLs and bare video IDs. A watch URL that also names a playlist
+    is treated as the video. Returns None for anything else.
+    """
+    url = url.strip()
+    if not url:
+        return None
+    if VIDEO_ID_PATTERN.match(url):
+        return YouTubeLink('video', url)
+    if '://' not in url:
+        url = 'https://' + url
+
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+    except ValueError:
+        return None
+    segments = [segment for segment in parts.path.split('/') if segment]
+    query = parse_qs(parts.query)
+
+    if host in SHORT_LINK_HOSTS:
+        video_id = _valid_video_id(segments[0] if segments else None)
+        return YouTubeLink('video', video_id) if video_id else None
+    if host not in YOUTUBE_HOSTS:
+        return None
+
+    if segments[:1] == ['watch'] or not segments:
+        video_id = _valid_video_id(query.get('v', [None])[0])
+        if video_id:
+            return YouTubeLink('video', video_id)
+    elif len(segments) >= 2 and segments[0] in VIDEO_PATH_PREFIXES and segments[1] != 'videoseries':
+        # /embed/videoseries は11文字だが動画IDではない
+        video_id = _valid_video_id(segments[1])
+        if video_id:
+            return YouTubeLink('video', video_id)
+
+    # /playlist?list=... や /embed/videoseries?list=...
+    playlist_id = query.get('list', [None])[0]
+    if playlist_id and PLAYLIST_ID_PATTERN.match(playlist_id):
+        return YouTubeLink('playlist', playlist_id)
+    return None
+
+def extract_video_id(url: str) -> str:
+    """Return the video ID of a YouTube video URL; raises ValueError otherwise."""
+    link = parse_youtube_url(url)
+    if link is None or link.kind != 'video':
+        raise ValueError("Invalid YouTube URL")
+    return link.id
+
+class NormalizedUrls(NamedTuple):
+    """Result of normalize_urls."""
+    # 重複を除いた動画・プレイリスト（入力順）
+    links: List[YouTubeLink]
+    # YouTube の URL として解釈できなかった入力
+    invalid: List[str]
+    # 既出の動画・プレイリストを指していたため除いた入力の数
+    duplicates: int
+
+    @property
+    def urls(self) -> List[str]:
+        return [link.url for link in self.links]
+
+def normalize_urls(urls: Iterable[str]) -> NormalizedUrls:
+    """Parse and dedupe URLs by video or playlist ID without any network access. Blank lines are ignored."""
+    links: List[YouTubeLink] = []
+    seen = set()
+    invalid: List[str] = []
+    duplicates = 0
+    for url in urls:
+        if not url.strip():
+            continue
+        link = parse_youtube_url(url)
+        if link is None:
+            invalid.append(url.strip())
+        elif link in seen:
+            duplicates += 1
+        else:
+            seen.add(link)
+            links.append(link)
+    return NormalizedUrls(links, invalid, duplicates)
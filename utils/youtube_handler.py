@@ -1,86 +1,502 @@
-from typing import Dict, List
-import google.api_core.exceptions
-from googleapiclient.discovery import build
-from youtube_transcript_api import YouTubeTranscriptApi
-import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import os
+import sqlite3
+import threading
+import time
+from .rate_limiter import QuotaAccountant, get_quota_accountant
+from .metrics import in_context, incr, span
+from .clients import get_client_registry
+from .url_normalizer import canonical_video_url, extract_video_id, normalize_urls
+from .transcript import Transcript
+
+class TranscriptCache:
+    """Disk-backed transcript cache shared across sessions and processes.
+
+    Entries are keyed by (video_id, language preference list) and stored in a
+    SQLite file, so every Streamlit session and worker process on the host
+    shares them. Transcripts are stored with their segment timings
+    (Transcript.to_json); entries written before timings were kept are
+    treated as misses and refetched. Entries expire after ``ttl_seconds`` and the least recently
+    used entries are evicted once the stored text exceeds ``max_bytes``.
+    """
+
+    DEFAULT_PATH = '.cache/transcripts.sqlite3'
+    DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, path: Optional[str] = None,
+                 ttl_seconds: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.path = Path(path or os.environ.get('TRANSCRIPT_CACHE_PATH', self.DEFAULT_PATH))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.environ.get('TRANSCRIPT_CACHE_TTL', self.DEFAULT_TTL_SECONDS))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', self.DEFAULT_MAX_BYTES))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS transcripts (
+                    key TEXT PRIMARY KEY,
+                    transcript TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )'''
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_transcripts_accessed_at ON transcripts(accessed_at)'
+            )
+
+    @contextmanager
+    def _connect(self):
+        # 接続はスレッド間で共有できないため、操作ごとに開いて閉じる
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _make_key(video_id: str, languages: List[str]) -> str:
+        return f"{video_id}:{','.join(languages)}"
+
+    def get(self, video_id: str, languages: List[str]) -> Optional[Transcript]:
+        """Return the cached transcript, or None on a miss or expired entry."""
+        key = self._make_key(video_id, languages)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT transcript, created_at FROM transcripts WHERE key = ?', (key,)
+                ).fetchone()
+                transcript = self._load(row[0]) if row and now - row[1] <= self.ttl_seconds else None
+                if transcript is not None:
+                    conn.execute('UPDATE transcripts SET accessed_at = ? WHERE key = ?', (now, key))
+                    with self._lock:
+                        self.hits += 1
+                    return transcript
+                if row:
+                    conn.execute('DELETE FROM transcripts WHERE key = ?', (key,))
+        except sqlite3.Error:
+            # キャッシュの障害で文字起こしの取得自体を失敗させない
+            pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    @staticmethod
+    def _load(data: str) -> Optional[Transcript]:
+        try:
+            return Transcript.from_json(data)
+        except ValueError:
+            # 時刻情報を持たない旧形式のエントリ
+            return None
+
+    def set(self, video_id: str, languages: List[str], transcript: Transcript) -> None:
+        """Store a transcript and evict entries beyond the TTL or byte budget."""
+        key = self._make_key(video_id, languages)
+        data = transcript.to_json()
+        size = len(data.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO transcripts (key, transcript, size, created_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, data, size, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones over budget."""
+        conn.execute('DELETE FROM transcripts WHERE created_at < ?', (now - self.ttl_seconds,))
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM transcripts').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evict_keys = []
+        for key, size in conn.execute('SELECT key, size FROM transcripts ORDER BY accessed_at ASC'):
+            if total <= self.max_bytes:
+                break
+            evict_keys.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM transcripts WHERE key = ?', evict_keys)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this process and the cache size on disk."""
+        try:
+            with self._connect() as conn:
+                entries, total = conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts'
+                ).fetchone()
+        except sqlite3.Error:
+            entries, total = 0, 0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': total
+        }
+
+_shared_transcript_cache: Optional[TranscriptCache] = None
+_shared_transcript_cache_lock = threading.Lock()
+
+def get_transcript_cache() -> TranscriptCache:
+    """Return the process-wide transcript cache."""
+    global _shared_transcript_cache
+    with _shared_transcript_cache_lock:
+        if _shared_transcript_cache is None:
+            _shared_transcript_cache = TranscriptCache()
+        return _shared_transcript_cache
+
+class ChannelCache:
+    """In-process cache of channel uploads playlists and their newest items.
+
+    Both maps hold at most ``max_entries`` entries and evict the least
+    recently used one beyond that. Uploads playlist IDs expire after
+    UPLOADS_PLAYLIST_TTL_SECONDS. Feed entries are kept for
+    FEED_RETENTION_SECONDS, well past their freshness, so a stale entry can
+    still be revalidated with its ETag.
+    """
+
+    DEFAULT_MAX_ENTRIES = 1024
+    UPLOADS_PLAYLIST_TTL_SECONDS = 24 * 60 * 60
+    FEED_RETENTION_SECONDS = 24 * 60 * 60
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(
+            os.environ.get('CHANNEL_CACHE_MAX_ENTRIES', self.DEFAULT_MAX_ENTRIES))
+        # channel_id -> (保存時刻, アップロード動画のプレイリストID)
+        self._uploads_playlists: OrderedDict = OrderedDict()
+        # (playlist_id, 件数) -> (保存時刻, (取得時刻, ETag, items))
+        self._feeds: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, store: OrderedDict, key, ttl_seconds: float):
+        with self._lock:
+            entry = store.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= ttl_seconds:
+                del store[key]
+                return None
+            store.move_to_end(key)
+            return entry[1]
+
+    def _set(self, store: OrderedDict, key, value):
+        with self._lock:
+            store[key] = (time.monotonic(), value)
+            store.move_to_end(key)
+            while len(store) > self.max_entries:
+                store.popitem(last=False)
+
+    def get_uploads_playlist(self, channel_id: str) -> Optional[str]:
+        return self._get(self._uploads_playlists, channel_id, self.UPLOADS_PLAYLIST_TTL_SECONDS)
+
+    def set_uploads_playlist(self, channel_id: str, playlist_id: str):
+        self._set(self._uploads_playlists, channel_id, playlist_id)
+
+    def get_feed(self, playlist_id: str, size: int) -> Optional[Tuple[float, Optional[str], List[Dict]]]:
+        """Return (fetched_at monotonic time, ETag, items) of a playlist feed, stale or not."""
+        return self._get(self._feeds, (playlist_id, size), self.FEED_RETENTION_SECONDS)
+
+    def set_feed(self, playlist_id: str, size: int, entry: Tuple[float, Optional[str], List[Dict]]):
+        self._set(self._feeds, (playlist_id, size), entry)
+
+_shared_channel_cache: Optional[ChannelCache] = None
+_shared_channel_cache_lock = threading.Lock()
+
+def get_channel_cache() -> ChannelCache:
+    """Return the process-wide channel cache."""
+    global _shared_channel_cache
+    with _shared_channel_cache_lock:
+        if _shared_channel_cache is None:
+            _shared_channel_cache = ChannelCache()
+        return _shared_channel_cache
 
 class YouTubeHandler:
-    def __init__(self, api_key: str):
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+    # process_videos の同時実行数の既定値
+    DEFAULT_MAX_WORKERS = 8
+    # videos().list に一度に渡せる動画IDの上限
+    MAX_IDS_PER_REQUEST = 50
+    # 文字起こしの言語の優先順位
+    TRANSCRIPT_LANGUAGES = ['en', 'ja', 'zh']
+    # チャンネルの最新動画一覧をキャッシュする秒数と、一度に取得する件数
+    CHANNEL_FEED_TTL_SECONDS = 300
+    CHANNEL_FEED_SIZE = 10
+    # resolve_urls でプレイリストから展開する動画数の既定の上限
+    MAX_PLAYLIST_VIDEOS = 50
+
+    def __init__(self, api_key: str, transcript_cache: Optional[TranscriptCache] = None,
+                 quota: Optional[QuotaAccountant] = None,
+                 channel_cache: Optional[ChannelCache] = None):
+        self.api_key = api_key
+        self.transcript_cache = transcript_cache or get_transcript_cache()
+        self.channel_cache = channel_cache or get_channel_cache()
+        self.quota = quota or get_quota_accountant()
+        # 取得済みの動画詳細（video_id -> details）
+        self._details_cache: Dict[str, Dict] = {}
+        self._details_lock = threading.Lock()
+
+    @property
+    def youtube(self):
+        """Return the YouTube API client for the current thread.
+
+        googleapiclient のサービス（httplib2）はスレッドセーフではないため、
+        スレッドごとのクライアントをプロセス全体のレジストリから取得する
+        （ハンドラーを作り直しても接続は再利用される）。
+        """
+        return get_client_registry().youtube(self.api_key)
+
+    def _execute(self, request, endpoint: str) -> Dict:
+        """Execute an API request after waiting for the rate limiter and charging its quota cost."""
+        self.quota.acquire_youtube(endpoint)
+        return request.execute()
 
     def extract_video_id(self, url: str) -> str:
-        """Extract video ID from YouTube URL."""
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'(?:youtu\.be\/)([0-9A-Za-z_-]{11})',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        raise ValueError("Invalid YouTube URL")
+        """Extract video ID from YouTube URL (any form handled by url_normalizer)."""
+        return extract_video_id(url)
 
-    def get_video_details(self, video_id: str) -> Dict:
-        """Get video title, description, and thumbnail."""
-        try:
-            response = self.youtube.videos().list(
-                part='snippet',
-                id=video_id
-            ).execute()
+    def expand_playlist(self, playlist_id: str, max_videos: Optional[int] = None) -> List[str]:
+        """Return the video IDs of a playlist in order, following pagination.
 
-            if not response['items']:
-                raise ValueError("Video not found")
+        Each page of up to MAX_IDS_PER_REQUEST items costs one quota unit.
+        Stops after ``max_videos`` IDs if given.
+        """
+        video_ids: List[str] = []
+        page_token = None
+        with span('expand_playlist'):
+            while max_videos is None or len(video_ids) < max_videos:
+                request = self.youtube.playlistItems().list(
+                    part='contentDetails',
+                    playlistId=playlist_id,
+                    maxResults=self.MAX_IDS_PER_REQUEST,
+                    pageToken=page_token
+                )
+                response = self._execute(request, 'playlistItems.list')
+                video_ids.extend(item['contentDetails']['videoId'] for item in response.get('items', []))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        return video_ids[:max_videos] if max_videos is not None else video_ids
 
-            snippet = response['items'][0]['snippet']
-            return {
-                'title': snippet['title'],
-                'description': snippet['description'],
-                'channelId': snippet['channelId'],
-                'thumbnail': snippet['thumbnails']['high']['url']  # 高解像度のサムネイルを取得
-            }
+    def resolve_urls(self, urls: List[str], max_playlist_videos: Optional[int] = MAX_PLAYLIST_VIDEOS
+                     ) -> Tuple[List[str], List[Dict]]:
+        """Turn input URLs into canonical watch URLs, one per distinct video.
+
+        URLs are parsed and deduplicated by video ID before any network call;
+        playlist URLs are then expanded into their videos (at most
+        ``max_playlist_videos`` each, None for all). Returns the canonical
+        URLs in input order and a ``{'url', 'error'}`` entry for every input
+        that is not a YouTube video or playlist, or whose playlist could not
+        be read.
+        """
+        normalized = normalize_urls(urls)
+        if normalized.duplicates:
+            incr('duplicate_urls', normalized.duplicates)
+        errors = [{'url': url, 'error': "Invalid YouTube URL"} for url in normalized.invalid]
+
+        video_ids: List[str] = []
+        for link in normalized.links:
+            if link.kind == 'video':
+                video_ids.append(link.id)
+                continue
+            try:
+                video_ids.extend(self.expand_playlist(link.id, max_playlist_videos))
+            except Exception as e:
+                errors.append({'url': link.url, 'error': f"Could not read playlist: {str(e)}"})
+
+        # プレイリスト内の動画と個別に指定された動画の重複も除く
+        return [canonical_video_url(video_id) for video_id in dict.fromkeys(video_ids)], errors
+
+    @staticmethod
+    def _parse_video_details(item: Dict) -> Dict:
+        """Convert a videos().list item into our details dict."""
+        snippet = item['snippet']
+        return {
+            'title': snippet['title'],
+            'description': snippet['description'],
+            'channelId': snippet['channelId'],
+            'thumbnail': snippet['thumbnails']['high']['url']  # 高解像度のサムネイルを取得
+        }
+
+    def get_videos_details(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """Get details for many videos, MAX_IDS_PER_REQUEST IDs per API call.
+
+        Returns a dict keyed by video ID. IDs that YouTube does not return
+        (deleted, private or invalid videos) are simply absent from the result.
+        """
+        with self._details_lock:
+            details = {vid: self._details_cache[vid] for vid in video_ids if vid in self._details_cache}
+
+        # 未取得のIDのみを重複なしで問い合わせる
+        pending = list(dict.fromkeys(vid for vid in video_ids if vid not in details))
+        if details:
+            incr('video_details_cache_hits', len(details))
+        if not pending:
+            return details
+
+        import google.api_core.exceptions
+        try:
+            for start in range(0, len(pending), self.MAX_IDS_PER_REQUEST):
+                chunk = pending[start:start + self.MAX_IDS_PER_REQUEST]
+                with span('get_video_details', videos=len(chunk)):
+                    response = self._execute(self.youtube.videos().list(
+                        part='snippet',
+                        id=','.join(chunk),
+                        maxResults=len(chunk)
+                    ), 'videos.list')
+
+                for item in response.get('items', []):
+                    details[item['id']] = self._parse_video_details(item)
         except google.api_core.exceptions.Error as e:
             raise Exception(f"YouTube API error: {str(e)}")
 
-    def get_transcript(self, video_id: str) -> str:
-        """Get video transcript."""
+        with self._details_lock:
+            self._details_cache.update(details)
+
+        return details
+
+    def get_video_details(self, video_id: str) -> Dict:
+        """Get video title, description, and thumbnail."""
+        details = self.get_videos_details([video_id])
+        if video_id not in details:
+            raise ValueError("Video not found")
+        return details[video_id]
+
+    def get_transcript(self, video_id: str, languages: Optional[List[str]] = None) -> Transcript:
+        """Get video transcript with its segment timings, served from the transcript cache when possible.
+
+        str() of the result is the plain caption text.
+        """
+        languages = languages or self.TRANSCRIPT_LANGUAGES
+        cached = self.transcript_cache.get(video_id, languages)
+        if cached is not None:
+            incr('transcript_cache_hits')
+            incr('transcript_chars', len(cached))
+            return cached
+
         try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en', 'ja', 'zh'])
-            return " ".join([entry['text'] for entry in transcript_list])
+            from youtube_transcript_api import YouTubeTranscriptApi
+            with span('get_transcript', video_id=video_id):
+                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+            transcript = Transcript.from_segments(video_id, transcript_list)
+            self.transcript_cache.set(video_id, languages, transcript)
+            incr('transcript_cache_misses')
+            incr('transcript_chars', len(transcript))
+            return transcript
         except Exception as e:
             raise Exception(f"Could not fetch transcript: {str(e)}")
 
+    def get_uploads_playlist_id(self, channel_id: str) -> str:
+        """Get the ID of the playlist holding a channel's uploads (cached per process)."""
+        playlist_id = self.channel_cache.get_uploads_playlist(channel_id)
+        if playlist_id:
+            return playlist_id
+
+        response = self._execute(self.youtube.channels().list(
+            part='contentDetails',
+            id=channel_id
+        ), 'channels.list')
+        if not response.get('items'):
+            raise ValueError("Channel not found")
+
+        playlist_id = response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        self.channel_cache.set_uploads_playlist(channel_id, playlist_id)
+        return playlist_id
+
+    def _get_playlist_feed(self, playlist_id: str, size: int) -> List[Dict]:
+        """Get the newest items of a playlist.
+
+        Results are cached for CHANNEL_FEED_TTL_SECONDS. After that the
+        request is sent with If-None-Match if the cached response had an
+        ETag, and a 304 response reuses the cached items.
+        """
+        cached = self.channel_cache.get_feed(playlist_id, size)
+        if cached and time.monotonic() - cached[0] < self.CHANNEL_FEED_TTL_SECONDS:
+            incr('channel_feed_cache_hits')
+            return cached[2]
+
+        request = self.youtube.playlistItems().list(
+            part='snippet',
+            playlistId=playlist_id,
+            maxResults=size
+        )
+        if cached and cached[1]:
+            request.headers['If-None-Match'] = cached[1]
+
+        from googleapiclient.errors import HttpError
+        try:
+            response = self._execute(request, 'playlistItems.list')
+            entry = (time.monotonic(), response.get('etag'), response.get('items', []))
+        except HttpError as e:
+            if not (cached and cached[1] and e.resp.status == 304):
+                raise
+            # 変更なし: キャッシュの有効期限だけ延長する
+            incr('channel_feed_not_modified')
+            entry = (time.monotonic(), cached[1], cached[2])
+
+        self.channel_cache.set_feed(playlist_id, size, entry)
+        return entry[2]
+
     def get_channel_latest_videos(self, url: str, max_results: int = 5) -> List[Dict]:
-        """Get latest videos from the same channel."""
+        """Get latest videos from the same channel.
+
+        Uses the channel's uploads playlist (playlistItems, 1 quota unit)
+        instead of search (100 units).
+        """
+        with span('get_channel_latest_videos'):
+            return self._get_channel_latest_videos(url, max_results)
+
+    def _get_channel_latest_videos(self, url: str, max_results: int) -> List[Dict]:
         try:
             # まず動画のチャンネルIDを取得
             video_id = self.extract_video_id(url)
             video_details = self.get_video_details(video_id)
             channel_id = video_details['channelId']
 
-            # チャンネルの最新動画を取得
-            response = self.youtube.search().list(
-                part='snippet',
-                channelId=channel_id,
-                order='date',  # 日付順で並べ替え
-                type='video',
-                maxResults=max_results + 1  # 現在の動画も含まれる可能性があるため+1
-            ).execute()
+            # チャンネルの最新動画を取得（アップロード順に並んでいる）
+            playlist_id = self.get_uploads_playlist_id(channel_id)
+            items = self._get_playlist_feed(
+                playlist_id,
+                max(self.CHANNEL_FEED_SIZE, max_results + 1)  # 現在の動画も含まれる可能性があるため+1
+            )
 
             latest_videos = []
             current_video_id = video_id.lower()  # 大文字小文字を区別しないように
 
-            for item in response.get('items', []):
-                if item['id']['kind'] == 'youtube#video':
-                    # 現在の動画を除外
-                    if item['id']['videoId'].lower() != current_video_id:
-                        latest_videos.append({
-                            'id': item['id']['videoId'],
-                            'title': item['snippet']['title'],
-                            'thumbnail': item['snippet']['thumbnails']['high']['url']  # 高解像度のサムネイルを使用
-                        })
-                        if len(latest_videos) >= max_results:
-                            break
+            for item in items:
+                snippet = item['snippet']
+                # 非公開・削除済みの動画はサムネイルがないため除外
+                if 'high' not in snippet.get('thumbnails', {}):
+                    continue
+                item_video_id = snippet['resourceId']['videoId']
+                # 現在の動画を除外
+                if item_video_id.lower() != current_video_id:
+                    latest_videos.append({
+                        'id': item_video_id,
+                        'title': snippet['title'],
+                        'thumbnail': snippet['thumbnails']['high']['url']  # 高解像度のサムネイルを使用
+                    })
+                    if len(latest_videos) >= max_results:
+                        break
 
             if not latest_videos:
                 raise Exception("No other videos found in this channel")
@@ -90,26 +506,76 @@ class YouTubeHandler:
         except Exception as e:
             raise Exception(f"Error getting channel videos: {str(e)}")
 
-    def process_videos(self, urls: List[str]) -> List[Dict]:
-        """Process multiple YouTube videos."""
-        results = []
-        for url in urls:
+    def _process_video(self, url: str, video_id: str, details: Dict) -> Dict:
+        """Fetch the transcript for a single video and build its result."""
+        try:
+            transcript = self.get_transcript(video_id)
+
+            return {
+                'url': url,
+                'video_id': video_id,
+                'title': details['title'],
+                'description': details['description'],
+                'thumbnail': details['thumbnail'],  # サムネイル情報を追加
+                'transcript': transcript
+            }
+        except Exception as e:
+            return {
+                'url': url,
+                'error': str(e)
+            }
+
+    def process_videos(self, urls: List[str], max_workers: int = DEFAULT_MAX_WORKERS) -> List[Dict]:
+        """Process multiple YouTube videos concurrently.
+
+        Video metadata is fetched in batches via get_videos_details, then the
+        transcripts are fetched on a thread pool. Results are returned in the
+        same order as ``urls``; URLs of the same video share one transcript
+        fetch. Set ``max_workers`` to 1 to fetch the transcripts sequentially.
+        """
+        if not urls:
+            return []
+
+        results: List[Dict] = [{} for _ in urls]
+        video_ids: Dict[int, str] = {}
+        for idx, url in enumerate(urls):
             try:
-                video_id = self.extract_video_id(url)
-                details = self.get_video_details(video_id)
-                transcript = self.get_transcript(video_id)
-
-                results.append({
-                    'url': url,
-                    'video_id': video_id,
-                    'title': details['title'],
-                    'description': details['description'],
-                    'thumbnail': details['thumbnail'],  # サムネイル情報を追加
-                    'transcript': transcript
-                })
+                video_ids[idx] = self.extract_video_id(url)
             except Exception as e:
-                results.append({
-                    'url': url,
-                    'error': str(e)
-                })
+                results[idx] = {'url': url, 'error': str(e)}
+
+        try:
+            details = self.get_videos_details(list(video_ids.values()))
+        except Exception as e:
+            for idx in video_ids:
+                results[idx] = {'url': urls[idx], 'error': str(e)}
+            return results
+
+        jobs = []
+        first_index: Dict[str, int] = {}
+        duplicates = []
+        for idx, video_id in video_ids.items():
+            if video_id not in details:
+                results[idx] = {'url': urls[idx], 'error': "Video not found"}
+            elif video_id in first_index:
+                duplicates.append((idx, video_id))
+            else:
+                first_index[video_id] = idx
+                jobs.append((idx, video_id))
+
+        if jobs:
+            workers = max(1, min(max_workers, len(jobs)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # ワーカースレッドの計測も現在のリクエストに記録する
+                fetched = executor.map(
+                    in_context(lambda job: self._process_video(urls[job[0]], job[1], details[job[1]])),
+                    jobs
+                )
+                for (idx, _), result in zip(jobs, fetched):
+                    results[idx] = result
+
+        # 同じ動画を指す入力には取得済みの結果を使い回す（文字起こしは1回だけ取得する）
+        for idx, video_id in duplicates:
+            results[idx] = {**results[first_index[video_id]], 'url': urls[idx]}
+
         return results